@@ -0,0 +1,338 @@
+"""
+HTTP API for the summarizer, for clients other than the Streamlit page.
+
+Requests are served on one asyncio event loop (Tornado). Everything that
+blocks runs in one of two bounded thread pools: IO_WORKERS for SQLite and
+the transcript/title fetches, LLM_WORKERS for model calls. A slow model call
+never holds up other requests, and model calls in flight are capped. All
+requests share one LLM client, the pooled HTTP session in `titles` and the
+SQLite connection pool in `database`.
+
+Endpoints (JSON in and out; errors are {"error": "..."}):
+  POST /videos                   {"url"}, ingests the video if it is new
+                                 -> {"video_id", "youtube_id", "title", "created"}
+  GET  /videos?limit=&cursor=    library page, newest first -> {"videos", "next_cursor"}
+  POST /videos/{id}/summary      -> {"summary", "created"}
+  POST /videos/{id}/chat         {"question", "stream"}; streams the answer as
+                                 plain text chunks, or -> {"answer"} if "stream" is false
+  GET  /videos/{id}/messages?limit=&cursor=
+                                 chat history, oldest first -> {"messages", "next_cursor"}
+  GET  /videos/{id}/usage        token counts and model usage -> {"transcript_tokens",
+                                 "context_mode", "messages", "message_tokens", "calls",
+                                 "prompt_tokens", "completion_tokens"}
+  GET  /metrics                  stage timings in Prometheus text format
+
+    uv run api.py --port 8000
+"""
+import argparse
+import asyncio
+import base64
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import tornado.iostream
+import tornado.web
+
+import conversation
+import database
+import tracing
+import transcripts
+from main import (build_system_instruction, choose_context_mode, console, extract_video_id, generate_summary,
+                  get_model, ingest_video, record_usage, stream_cached, video_context_mode, CONTEXT_MODE,
+                  SUMMARY_REQUEST)
+
+IO_WORKERS = 16
+LLM_WORKERS = 8
+PAGE_LIMIT = 50
+MAX_PAGE_LIMIT = 500
+
+io_pool = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix="api-io")
+llm_pool = ThreadPoolExecutor(max_workers=LLM_WORKERS, thread_name_prefix="api-llm")
+
+
+def run_io(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(io_pool, fn, *args)
+
+
+def run_llm(fn, *args):
+    return asyncio.get_running_loop().run_in_executor(llm_pool, fn, *args)
+
+
+def encode_cursor(cursor):
+    if cursor is None:
+        return None
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(text):
+    """The (timestamp, id) pair encoded by encode_cursor, or a 400 for anything else."""
+    if not text:
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(text.encode("ascii")))
+    except ValueError:
+        cursor = None
+    if not (isinstance(cursor, list) and len(cursor) == 2
+            and all(isinstance(value, (str, int, float)) for value in cursor)):
+        raise tornado.web.HTTPError(400, reason="invalid cursor")
+    return tuple(cursor)
+
+
+class Locks:
+    """One asyncio.Lock per key, so concurrent requests for the same video take turns."""
+
+    def __init__(self):
+        self._locks = {}
+
+    def __call__(self, key):
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        return lock
+
+
+class BaseHandler(tornado.web.RequestHandler):
+    def initialize(self, llm, locks):
+        self.llm = llm
+        self.locks = locks
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_error(self, status_code, **kwargs):
+        self.finish({"error": self._reason})
+
+    def json_body(self):
+        try:
+            body = json.loads(self.request.body or b"{}")
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="body is not valid JSON")
+        if not isinstance(body, dict):
+            raise tornado.web.HTTPError(400, reason="body must be a JSON object")
+        return body
+
+    def page_args(self):
+        try:
+            limit = int(self.get_query_argument("limit", PAGE_LIMIT))
+        except ValueError:
+            raise tornado.web.HTTPError(400, reason="limit must be an integer")
+        if not 1 <= limit <= MAX_PAGE_LIMIT:
+            raise tornado.web.HTTPError(400, reason=f"limit must be between 1 and {MAX_PAGE_LIMIT}")
+        return limit, decode_cursor(self.get_query_argument("cursor", None))
+
+    def require_llm(self):
+        if self.llm is None:
+            raise tornado.web.HTTPError(503, reason="GOOGLE_API_KEY is not set")
+
+    async def video(self, video_id):
+        """The (id, youtube_id, title) row for `video_id`, recorded as opened, or a 404."""
+        row = await run_io(database.get_video_by_id, int(video_id))
+        if row is None:
+            raise tornado.web.HTTPError(404, reason="video not found")
+        await run_io(database.touch_video, row[0])
+        return row
+
+    async def ensure_summary(self, video_id):
+        """Returns (summary, created), generating and storing the initial summary if there is none."""
+        summary = await run_io(database.get_video_summary, video_id)
+        if summary is not None:
+            return summary, False
+        try:
+            # Refetched here if maintenance evicted it
+            transcript = await run_io(transcripts.load, video_id)
+        except transcripts.TranscriptUnavailable as e:
+            raise tornado.web.HTTPError(422, reason=str(e))
+        if transcript is None:
+            raise tornado.web.HTTPError(422, reason="video has no transcript")
+        usage = {}
+        summary = await run_llm(generate_summary, self.llm, video_id, usage)
+        await run_io(database.add_messages, video_id, [("user", SUMMARY_REQUEST), ("ai", summary)])
+        await run_io(record_usage, video_id, usage)
+        return summary, True
+
+
+class VideosHandler(BaseHandler):
+    async def get(self):
+        limit, cursor = self.page_args()
+        rows, next_cursor = await run_io(database.get_videos_page, limit, cursor)
+        self.finish({"videos": [{"video_id": pk, "youtube_id": youtube_id, "title": title}
+                                for pk, youtube_id, title in rows],
+                     "next_cursor": encode_cursor(next_cursor)})
+
+    async def post(self):
+        url = self.json_body().get("url")
+        if not isinstance(url, str) or not url.strip():
+            raise tornado.web.HTTPError(400, reason='"url" is required')
+        youtube_id = extract_video_id(url.strip())
+        # Concurrent requests for the same video fetch it once
+        async with self.locks(f"ingest:{youtube_id}"):
+            existing = await run_io(database.get_video, youtube_id)
+            created = existing is None
+            if created:
+                db_id, _ = await run_io(ingest_video, url.strip())
+                if db_id is None:
+                    raise tornado.web.HTTPError(422, reason="could not fetch the transcript")
+            else:
+                db_id = existing[0]
+            _, youtube_id, title = await run_io(database.get_video_by_id, db_id)
+        if created:
+            self.set_status(201)
+        self.finish({"video_id": db_id, "youtube_id": youtube_id, "title": title, "created": created})
+
+
+class SummaryHandler(BaseHandler):
+    async def post(self, video_id):
+        self.require_llm()
+        video_id = (await self.video(video_id))[0]
+        async with self.locks(video_id):
+            summary, created = await self.ensure_summary(video_id)
+        if created:
+            self.set_status(201)
+        self.finish({"summary": summary, "created": created})
+
+
+class ChatHandler(BaseHandler):
+    def initialize(self, llm, locks):
+        super().initialize(llm, locks)
+        self.closed = threading.Event()
+
+    def on_connection_close(self):
+        self.closed.set()
+
+    def prepare_answer(self, video_id, youtube_id, question, stats):
+        """
+        Runs on the LLM pool: returns a generator streaming the answer from the response
+        cache or the model. The model usage is added to `stats` as it happens.
+        """
+        conversation_summary, recent = conversation.load_compacted(self.llm, video_id, stats)
+        recent = recent + [("user", question)]
+
+        def build_messages():
+            system_instruction = build_system_instruction(video_id, question, CONTEXT_MODE, self.llm, stats)
+            return conversation.to_messages(system_instruction, conversation_summary, recent)
+
+        history = conversation.cache_history(conversation_summary, recent)
+        mode, _ = video_context_mode(video_id, CONTEXT_MODE)
+        return stream_cached(self.llm, build_messages, youtube_id, history, mode, stats)
+
+    def produce(self, chunks, loop, queue):
+        """Runs on the LLM pool: feeds `chunks` into `queue`, then None (or the exception)."""
+        try:
+            for text in chunks:
+                if self.closed.is_set():
+                    break
+                loop.call_soon_threadsafe(queue.put_nowait, text)
+            item = None
+        except Exception as e:
+            item = e
+        finally:
+            chunks.close()
+        loop.call_soon_threadsafe(queue.put_nowait, item)
+
+    async def post(self, video_id):
+        body = self.json_body()
+        question = body.get("question")
+        if not isinstance(question, str) or not question.strip():
+            raise tornado.web.HTTPError(400, reason='"question" is required')
+        question = question.strip()
+        stream = body.get("stream", True)
+        self.require_llm()
+        video_id, youtube_id, _ = await self.video(video_id)
+
+        # One conversation per video: its turns are answered and stored in order
+        async with self.locks(video_id):
+            await self.ensure_summary(video_id)
+            stats = {}
+            chunks = await run_llm(self.prepare_answer, video_id, youtube_id, question, stats)
+            queue = asyncio.Queue()
+            producer = run_llm(self.produce, chunks, asyncio.get_running_loop(), queue)
+            if stream:
+                self.set_header("Content-Type", "text/plain; charset=utf-8")
+            parts = []
+            try:
+                while (item := await queue.get()) is not None:
+                    if isinstance(item, Exception):
+                        raise item
+                    parts.append(item)
+                    if stream:
+                        self.write(item)
+                        await self.flush()
+            except tornado.iostream.StreamClosedError:
+                # The client went away; the producer stops at its next chunk
+                self.closed.set()
+            finally:
+                await producer
+            # Tokens spent on an answer the client abandoned still count
+            await run_io(record_usage, video_id, stats)
+            if self.closed.is_set():
+                return
+            # Stored only once complete, so a cut-off answer leaves no half turn behind
+            answer = "".join(parts)
+            await run_io(database.add_messages, video_id, [("user", question), ("ai", answer)])
+        if stream:
+            self.finish()
+        else:
+            self.finish({"answer": answer})
+
+
+class MessagesHandler(BaseHandler):
+    async def get(self, video_id):
+        limit, cursor = self.page_args()
+        video_id = (await self.video(video_id))[0]
+        rows, next_cursor = await run_io(database.get_chat_page, video_id, limit, cursor)
+        self.finish({"messages": [{"role": role, "content": content} for role, content in rows],
+                     "next_cursor": encode_cursor(next_cursor)})
+
+
+class UsageHandler(BaseHandler):
+    async def get(self, video_id):
+        video_id = (await self.video(video_id))[0]
+        usage = await run_io(database.get_token_stats, video_id)
+        tokens = usage["transcript_tokens"]
+        mode = choose_context_mode(CONTEXT_MODE, tokens) if tokens is not None else None
+        self.finish({**usage, "context_mode": mode})
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    def get(self):
+        self.set_header("Content-Type", "text/plain; version=0.0.4")
+        self.finish(tracing.metrics_text())
+
+
+def make_app(llm):
+    """Builds the Tornado application around one shared LLM client (None: summary and chat return 503)."""
+    shared = {"llm": llm, "locks": Locks()}
+    return tornado.web.Application([
+        (r"/videos", VideosHandler, shared),
+        (r"/videos/(\d+)/summary", SummaryHandler, shared),
+        (r"/videos/(\d+)/chat", ChatHandler, shared),
+        (r"/videos/(\d+)/messages", MessagesHandler, shared),
+        (r"/videos/(\d+)/usage", UsageHandler, shared),
+        (r"/metrics", MetricsHandler),
+    ])
+
+
+async def serve(port, address):
+    database.init_db()
+    llm = get_model()
+    if llm is None:
+        console.print("[yellow]GOOGLE_API_KEY not set: summary and chat return 503.[/yellow]")
+    make_app(llm).listen(port, address)
+    console.print(f"[bold green]Listening on http://{address}:{port}[/bold green]")
+    await asyncio.Event().wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--address", default="127.0.0.1")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.port, args.address))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
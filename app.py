@@ -1,35 +1,66 @@
 import streamlit as st
+import datetime
 import os
-import requests
 import re
-from bs4 import BeautifulSoup
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 
 # Import our custom modules
+import conversation
 import database
-from main import get_transcript, get_model
+import jobs
+import response_cache
+import speculation
+import tokens
+import tracing
+from main import (build_system_instruction, choose_context_mode, extract_video_id, get_model, ingest_video,
+                  record_usage, stream_cached, video_context_mode, MODEL_NAME, TEMPERATURE, CONTEXT_MODE, JOB_QUEUE,
+                  SPECULATIVE, SUMMARY_REQUEST)
 
 # Load env vars
 load_dotenv()
 
 st.set_page_config(page_title="YouTube Summarizer & Chat", layout="wide")
 
-# Initialize DB
-database.init_db()
+# Collect per-stage timings for this run; shown in the sidebar on the next one
+tracing.begin()
+
+# Initialize DB (once per process, not on every rerun)
+@st.cache_resource
+def init_database(db_name):
+    database.init_db()
+    tracing.start_metrics_server()
+
+init_database(database.DB_NAME)
 
 # --- Custom Font & Dark Mode CSS ---
 import base64
+FONT_FILE = "JetBrainsMonoNerdFont-Regular.woff2"
+
 def get_img_as_base64(file):
     with open(file, "rb") as f:
         data = f.read()
     return base64.b64encode(data).decode()
 
-# Try to load local font, else fallback
-try:
-    font_b64 = get_img_as_base64("JetBrainsMonoNerdFont-Regular.woff2")
-    font_face = f"""
+def get_mtime(file):
+    try:
+        return os.path.getmtime(file)
+    except OSError:
+        return None
+
+@st.cache_data
+def get_font_face(file, mtime):
+    """
+    Builds the @font-face rule with the font inlined as base64.
+    Keyed on the file's mtime, so replacing the font invalidates the cache.
+    """
+    # Try to load local font, else fallback
+    if mtime is None:
+        return ""
+    try:
+        font_b64 = get_img_as_base64(file)
+    except Exception:
+        return ""
+    return f"""
     @font-face {{
         font-family: 'JetBrainsMono';
         src: url('data:font/woff2;base64,{font_b64}') format('woff2');
@@ -37,14 +68,22 @@ try:
         font-style: normal;
     }}
     """
-except Exception:
-    font_face = ""
 
 # --- Sidebar Configuration ---
 st.sidebar.title("⚙️ CONFIG")
 accent_color = st.sidebar.color_picker("Accent Color", "#00ff00") # Default Neon Green
+CONTEXT_MODES = {"auto": "Automatic (by length)", "full": "Full transcript",
+                 "compact": "Notes + relevant excerpts", "retrieval": "Relevant excerpts"}
+context_mode = st.sidebar.selectbox("Context Mode", list(CONTEXT_MODES), format_func=CONTEXT_MODES.get,
+                                    index=list(CONTEXT_MODES).index(CONTEXT_MODE))
+speculate = st.sidebar.toggle("Pre-answer suggestions", value=SPECULATIVE,
+                              help="Answer the suggested questions in the background while you read. Uses extra tokens.")
 
-st.markdown(f"""
+@st.cache_data(max_entries=32)
+def build_css(accent_color, font_mtime):
+    """Renders the theme stylesheet; cached per accent color and font version."""
+    font_face = get_font_face(FONT_FILE, font_mtime)
+    return f"""
 <style>
     {font_face}
     
@@ -225,17 +264,11 @@ st.markdown(f"""
     }}
 
 </style>
-""", unsafe_allow_html=True)
-# --- Helpers ---
-def get_video_title(url):
-    try:
-        r = requests.get(url)
-        soup = BeautifulSoup(r.text, 'html.parser')
-        title = soup.title.string.replace(" - YouTube", "")
-        return title
-    except:
-        return "Unknown Video"
+"""
+
+st.markdown(build_css(accent_color, get_mtime(FONT_FILE)), unsafe_allow_html=True)
 
+# --- Helpers ---
 def extract_suggestions(text):
     """
     Extracts suggested questions from the AI response text.
@@ -260,42 +293,207 @@ def extract_suggestions(text):
             pass
     return suggestions
 
-def generate_ai_response(db_id, system_instruction, llm):
+@st.cache_resource(max_entries=8)
+def get_llm(model_name, temperature):
+    """One shared LLM client per (model, temperature) for the whole process."""
+    return get_model(model_name, temperature)
+
+def answer_suggestion(db_id, question, llm, context_mode, conversation_summary, recent):
+    """
+    Answers `question` as if it had just been asked after the compacted conversation
+    (`conversation_summary`, `recent`). Only the model usage is stored, not the answer.
+    Runs on a speculation thread, so it must not touch Streamlit.
+    """
+    usage = {}
+    system_instruction = build_system_instruction(db_id, question, context_mode, llm, usage)
+    messages = conversation.to_messages(system_instruction, conversation_summary, recent + [("user", question)])
+    response = llm.invoke(messages)
+    # Paid for whether or not the user ever picks this suggestion
+    tokens.add_response_usage(usage, messages, response)
+    record_usage(db_id, usage)
+    return response
+
+def generate_ai_response(db_id, llm, context_mode, pre_generated=None):
     """
     Generates AI response based on current DB history, displays it, and saves it.
+    `pre_generated` is an answer already produced by speculation, shown as is.
     """
-    # Build Context
-    messages = [SystemMessage(content=system_instruction)]
-    current_history = database.get_chat_history(db_id)
-    for role, content in current_history:
-        if role == "user":
-            messages.append(HumanMessage(content=content))
-        else:
-            messages.append(AIMessage(content=content))
+    stats = {}
+    if pre_generated is not None:
+        with st.chat_message("assistant"):
+            st.markdown(pre_generated)
+        database.add_message(db_id, "ai", pre_generated)
+        st.session_state.last_response_timing = (db_id, {"speculative": True})
+        st.session_state.last_trace = tracing.finish()
+        st.rerun()
+
+    # Older turns are folded into a running summary; only recent ones go in verbatim
+    conversation_summary, recent = conversation.load_compacted(llm, db_id, stats)
+    youtube_id = database.get_video_by_id(db_id)[1]
+    question = recent[-1][1] if recent and recent[-1][0] == "user" else None
+
+    # Build Context (skipped entirely when the answer is cached)
+    def build_messages():
+        system_instruction = build_system_instruction(db_id, question, context_mode, llm, stats)
+        return conversation.to_messages(system_instruction, conversation_summary, recent)
     
-    # Generate Answer
+    # Generate Answer, rendering tokens as they stream in
     with st.chat_message("assistant"):
-        with st.spinner("Thinking..."):
-            response = llm.invoke(messages)
-            st.markdown(response.content)
+        cache_turns = conversation.cache_history(conversation_summary, recent)
+        mode, _ = video_context_mode(db_id, context_mode)
+        content = st.write_stream(stream_cached(llm, build_messages, youtube_id, cache_turns, mode, stats))
     
-    # Save AI message
-    database.add_message(db_id, "ai", response.content)
+    # Save AI message only once it is complete. If the stream is cut off, the
+    # user message stays last and the AUTO-RESUME CHECK regenerates it.
+    database.add_message(db_id, "ai", content)
+    record_usage(db_id, stats)
+    st.session_state.last_response_timing = (db_id, stats)
+    st.session_state.last_trace = tracing.finish()
     st.rerun()
 
+def start_job(key, enqueue):
+    """
+    Enqueues a job once per session for `key` and returns the key for show_job. Later
+    reruns reuse the job, so a failed one stays on screen instead of being queued again.
+    """
+    started = st.session_state.setdefault("jobs", {})
+    if key not in started:
+        started[key] = enqueue()
+    return key
+
+@st.fragment(run_every=1.0)
+def show_job(key, label):
+    """Polls a background job every second; reruns the whole page once it is done."""
+    job = jobs.status(st.session_state.jobs[key])
+    if job is None or job["state"] == "failed":
+        st.error(f"{label} failed: {job['error'] if job else 'job not found'}")
+        if st.button("Retry", key=f"retry_{key}"):
+            del st.session_state.jobs[key]
+            st.rerun()
+        return
+    if job["state"] == "done":
+        del st.session_state.jobs[key]
+        if job["kind"] == "ingest":
+            st.session_state.current_video_id = job["result"]["video_id"]
+        st.rerun()
+    retry = f" · attempt {job['attempts'] + 1}, last error: {job['error']}" if job["error"] else ""
+    st.info(f"{label}... ({job['state']}{retry})")
+
 # --- Sidebar: History ---
 st.sidebar.title("📚 Library")
 if st.sidebar.button("➕ New Video Check"):
     st.session_state.current_video_id = None
     st.rerun()
 
+# Full-text search over titles, transcripts and chats; best match per video
+search_query = st.sidebar.text_input("🔎 Search library", key="library_search")
+if search_query:
+    results = database.search(search_query)
+    if not results:
+        st.sidebar.caption("No matches.")
+    for v_id, y_id, v_title, kind, snippet in results:
+        label = v_title if v_title else f"Video {y_id}"
+        if st.sidebar.button(label, key=f"search_{v_id}", use_container_width=True):
+            st.session_state.current_video_id = v_id
+            st.rerun()
+        st.sidebar.caption(f"{kind}: {snippet}")
+
 st.sidebar.write("---")
-all_videos = database.get_all_videos()
-for v_id, y_id, v_title in all_videos:
-    label = v_title if v_title else f"Video {y_id}"
-    if st.sidebar.button(label, key=f"hist_{v_id}", use_container_width=True):
-        st.session_state.current_video_id = v_id
-        st.rerun()
+LIBRARY_PAGE_SIZE = 50
+# Pages rendered at once. Loading more past this drops the newest page off the top,
+# so the sidebar costs the same to render however far down the library you go.
+LIBRARY_WINDOW_PAGES = 4
+
+@st.cache_data(max_entries=4)
+def library_size(db_name, latest_video_id):
+    """Cached video count; adding a video changes latest_video_id and so recounts."""
+    return database.count_videos()
+
+def library_group(created_at, today):
+    """Sidebar heading for a video added at `created_at` (a stored TIMESTAMP)."""
+    if created_at is None:
+        return "Undated"
+    day = datetime.date.fromisoformat(str(created_at)[:10])
+    age = (today - day).days
+    if age <= 0:
+        return "Today"
+    if age == 1:
+        return "Yesterday"
+    if age < 7:
+        return "Previous 7 days"
+    if age < 30:
+        return "Previous 30 days"
+    return day.strftime("%B %Y")
+
+# library_cursors[i] is where page i starts (keyset cursors, discovered as pages are
+# loaded); library_first is the first page in the window. Only the window's first page
+# is loaded from a saved cursor; the rest follow on from the page before, so videos
+# added or removed since a cursor was saved cannot open a gap inside the window
+if "library_cursors" not in st.session_state:
+    st.session_state.library_cursors = [None]
+    st.session_state.library_first = 0
+library_cursors = st.session_state.library_cursors
+library_first = st.session_state.library_first
+library_last = min(library_first + LIBRARY_WINDOW_PAGES, len(library_cursors)) - 1
+
+group_by_date = st.sidebar.toggle("Group by date", key="library_group_by_date")
+if library_first > 0 and st.sidebar.button("⬆ Newer", key="library_newer", use_container_width=True):
+    st.session_state.library_first -= 1
+    st.rerun()
+
+library_shown, current_group, today = 0, None, datetime.date.today()
+library_cursor = library_cursors[library_first]
+for page_number in range(library_first, library_last + 1):
+    page, library_cursor = database.get_videos_page(LIBRARY_PAGE_SIZE, library_cursor, with_created_at=True)
+    for v_id, y_id, v_title, created_at in page:
+        if group_by_date:
+            group = library_group(created_at, today)
+            if group != current_group:
+                st.sidebar.caption(group)
+                current_group = group
+        label = v_title if v_title else f"Video {y_id}"
+        if st.sidebar.button(label, key=f"hist_{v_id}", use_container_width=True):
+            st.session_state.current_video_id = v_id
+            st.rerun()
+    library_shown += len(page)
+    if library_cursor is None:
+        library_last = page_number
+        break
+    if page_number + 1 < len(library_cursors):
+        library_cursors[page_number + 1] = library_cursor
+
+library_total = library_size(database.DB_NAME, database.get_latest_video_id())
+if library_shown:
+    first_shown = library_first * LIBRARY_PAGE_SIZE + 1
+    st.sidebar.caption(f"Showing {first_shown:,}–{first_shown + library_shown - 1:,} of {library_total:,}")
+
+if library_cursor is not None and st.sidebar.button("Load more", key="library_more", use_container_width=True):
+    if library_last + 1 == len(library_cursors):
+        library_cursors.append(library_cursor)
+    st.session_state.library_first = max(library_first, library_last + 2 - LIBRARY_WINDOW_PAGES)
+    st.rerun()
+
+cache_stats = response_cache.stats()
+st.sidebar.caption(f"Response cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses")
+spec_stats = speculation.stats()
+if spec_stats["started"]:
+    st.sidebar.caption(f"Pre-answers: {spec_stats['hits']}/{spec_stats['started']} used · "
+                       f"{spec_stats['wasted_tokens']:,} tokens wasted")
+
+# Timing breakdown of the previous request (the run that led to this page)
+last_trace = st.session_state.get("last_trace")
+if last_trace:
+    with st.sidebar.expander("⏱ Performance"):
+        totals = {}
+        for entry in last_trace:
+            stage = totals.setdefault(entry["stage"], {"stage": entry["stage"], "calls": 0, "ms": 0.0, "bytes": 0, "tokens": 0})
+            stage["calls"] += 1
+            stage["ms"] += entry["ms"]
+            stage["bytes"] += entry.get("bytes", 0)
+            stage["tokens"] += entry.get("tokens", 0)
+        rows = sorted(totals.values(), key=lambda r: -r["ms"])
+        st.caption(f"{len(last_trace)} traced calls · {sum(r['ms'] for r in rows):.1f} ms")
+        st.dataframe([{**r, "ms": round(r["ms"], 1)} for r in rows], hide_index=True, use_container_width=True)
 
 # --- Main Logic ---
 
@@ -310,13 +508,7 @@ if st.session_state.current_video_id is None:
     url = st.text_input("Enter YouTube Video URL:")
     
     if url:
-        vid_id = None
-        if "v=" in url:
-            vid_id = url.split("v=")[1].split("&")[0]
-        elif "youtu.be" in url:
-            vid_id = url.split("/")[-1]
-        else:
-            vid_id = url
+        vid_id = extract_video_id(url)
             
         with st.spinner("Checking library..."):
             existing_vid = database.get_video(vid_id)
@@ -324,12 +516,14 @@ if st.session_state.current_video_id is None:
         if existing_vid:
             st.session_state.current_video_id = existing_vid[0]
             st.rerun()
+        elif JOB_QUEUE:
+            show_job(start_job(f"ingest:{vid_id}", lambda: jobs.enqueue_ingest(url)), "Fetching transcript & title")
         else:
             with st.spinner("Fetching transcript & Title..."):
-                transcript = get_transcript(url)
-                if transcript:
-                    title = get_video_title(url)
-                    new_id = database.save_video(vid_id, title, transcript)
+                # With a key, long videos are condensed for the summary during ingestion
+                llm = get_llm(MODEL_NAME, TEMPERATURE) if os.environ.get("GOOGLE_API_KEY") else None
+                new_id, _ = ingest_video(url, llm)
+                if new_id:
                     st.session_state.current_video_id = new_id
                     st.rerun()
                 else:
@@ -343,68 +537,106 @@ else:
         st.session_state.current_video_id = None
         st.rerun()
         
-    db_id, y_id, title, transcript = v_data
+    db_id, y_id, title = v_data
+    # Recently opened videos keep their transcripts when maintenance.py evicts (one write an hour at most)
+    database.touch_video(db_id)
     
     st.title(f"{title}")
+    usage = database.get_token_stats(db_id)
+    if usage["transcript_tokens"] is not None:
+        mode = choose_context_mode(context_mode, usage["transcript_tokens"])
+        st.caption(f"Transcript ~{usage['transcript_tokens']:,} tokens ({CONTEXT_MODES[mode].lower()}) · "
+                   f"chat {usage['messages']} messages, ~{usage['message_tokens']:,} tokens · "
+                   f"model usage {usage['calls']} calls, {usage['prompt_tokens']:,} prompt + "
+                   f"{usage['completion_tokens']:,} completion tokens")
     
-    history = database.get_chat_history(db_id)
+    # Only the newest pages of the conversation are loaded for display
+    CHAT_PAGE_SIZE = 50
+    if st.session_state.get("chat_pages_video") != db_id:
+        st.session_state.chat_pages_video = db_id
+        st.session_state.chat_pages = 1
+    history, chat_cursor = database.get_chat_page(db_id, CHAT_PAGE_SIZE)
+    for _ in range(st.session_state.chat_pages - 1):
+        if chat_cursor is None:
+            break
+        older, chat_cursor = database.get_chat_page(db_id, CHAT_PAGE_SIZE, chat_cursor)
+        history = older + history
     
-    llm = get_model()
+    llm = get_llm(MODEL_NAME, TEMPERATURE) if os.environ.get("GOOGLE_API_KEY") else None
     if not llm:
         st.error("API Key not configured.")
         st.stop()
 
-    system_instruction = f'''
-You are a helpful assistant.
-Your goal is to answer questions based on the video content provided below.
-CRITICAL INSTRUCTION: Do NOT mention "the transcript", "the text", or "according to the video" in your responses. 
-Act as if you just watched the video and know the information naturally.
-After answering the user's question, you MUST provide 3 short "Next Question" suggestions relevant to the context.
-Format the suggestions clearly at the end of your response like this:
-
-**Suggested Questions:**
-1. ...
-2. ...
-3. ...
-
-Context Data:
-{transcript}
-'''
-
     # AUTO-RESUME CHECK
     # If the last message was from the user, it means the generation was interrupted.
     # We should retry generating the response immediately.
     if history and history[-1][0] == "user":
-        generate_ai_response(db_id, system_instruction, llm)
+        generate_ai_response(db_id, llm, context_mode)
 
     # If history is empty, auto-generate summary
+    if not history and JOB_QUEUE:
+        show_job(start_job(f"summary:{db_id}", lambda: jobs.enqueue_summary(db_id)),
+                 "Generating initial summary")
+        st.stop()
     if not history:
         with st.spinner("Generating initial summary..."):
-            database.add_message(db_id, "user", "Please provide a short summary paragraph of the video content.")
-            generate_ai_response(db_id, system_instruction, llm)
+            database.add_message(db_id, "user", SUMMARY_REQUEST)
+            generate_ai_response(db_id, llm, context_mode)
 
     # Display History
+    if chat_cursor is not None and st.button("Show earlier messages"):
+        st.session_state.chat_pages += 1
+        st.rerun()
+
     for role, content in history:
         if role == "user":
             st.chat_message("user").markdown(content)
         else:
             st.chat_message("assistant").markdown(content)
 
+    timing_video, timing = st.session_state.get("last_response_timing", (None, None))
+    if timing_video == db_id and history and history[-1][0] == "ai":
+        if timing.get("speculative"):
+            st.caption("Answered ahead of time")
+        elif timing.get("cached"):
+            st.caption("Served from response cache")
+        else:
+            st.caption(f"First token {timing['ttft']:.2f}s · total {timing['total']:.2f}s · "
+                       f"prompt ~{timing['prompt_estimate']:,} tokens")
+
     # Extract Suggestions from Last AI Message
     last_suggestions = []
     if history and history[-1][0] == 'ai':
         last_suggestions = extract_suggestions(history[-1][1])
 
+    # Answer the suggestions in the background while the user reads (one round per answer)
+    if "speculator" not in st.session_state:
+        st.session_state.speculator = speculation.Speculator()
+    speculator = st.session_state.speculator
+    basis = (db_id, history[-1][1]) if history else None
+    if speculate and last_suggestions and not speculator.is_current(basis):
+        # Folded (and saved) once for the round, not once per suggestion; the next real turn reuses it
+        fold_usage = {}
+        conversation_summary, recent = conversation.load_compacted(llm, db_id, fold_usage)
+        record_usage(db_id, fold_usage)
+        speculator.start(basis, last_suggestions, lambda q: answer_suggestion(db_id, q, llm, context_mode,
+                                                                              conversation_summary, recent))
+
     # Display Suggestion Buttons (if any)
     if last_suggestions:
         st.write("Something specific?")
         cols = st.columns(len(last_suggestions))
         for idx, suggestion in enumerate(last_suggestions):
             if cols[idx].button(suggestion, key=f"sugg_{idx}"):
+                with st.spinner("Thinking..."):
+                    pre_generated = speculator.take(basis, suggestion)
                 database.add_message(db_id, "user", suggestion)
-                generate_ai_response(db_id, system_instruction, llm)
+                generate_ai_response(db_id, llm, context_mode, pre_generated)
 
     # Chat Input
     if prompt := st.chat_input("Ask a question about the video..."):
+        speculator.discard()
         database.add_message(db_id, "user", prompt)
-        generate_ai_response(db_id, system_instruction, llm)
+        generate_ai_response(db_id, llm, context_mode)
+
+st.session_state.last_trace = tracing.finish()
@@ -0,0 +1 @@
+"""Offline benchmarks. Run each module with `uv run python -m benchmarks.<name>`."""
@@ -0,0 +1,129 @@
+"""
+Load test for api.py against the local fakes (no YouTube or Gemini traffic).
+
+Starts the API in-process on a free port, then runs `--clients` concurrent
+clients over HTTP. Each client ingests its own video, requests the summary,
+and holds a `--turns`-long streamed chat, listing the library between turns.
+Prints latency percentiles per endpoint (and time to first streamed byte for
+chat) plus overall request throughput, as JSON.
+
+    uv run python -m benchmarks.api_load --clients 32 --turns 5
+    uv run python -m benchmarks.api_load --clients 64 --llm-ttft 1.0 --llm-workers 16
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+import tornado.httpclient
+import tornado.httpserver
+import tornado.testing
+
+import api
+import database
+from benchmarks.fakes import FakeChatModel, FakeHttp, FakeTranscriptApi, installed
+from benchmarks.suite import percentiles
+from main import get_model
+
+
+async def request(client, samples, name, url, body=None, first_byte=None):
+    start = time.perf_counter()
+    first = []
+
+    def on_chunk(chunk):
+        if not first:
+            first.append(time.perf_counter() - start)
+        parts.append(chunk)
+
+    parts = []
+    response = await client.fetch(url, method="GET" if body is None else "POST",
+                                  body=None if body is None else json.dumps(body),
+                                  streaming_callback=on_chunk, request_timeout=600, raise_error=False)
+    samples.setdefault(name, []).append(time.perf_counter() - start)
+    if first_byte is not None and first:
+        samples.setdefault(first_byte, []).append(first[0])
+    if response.code >= 400:
+        raise RuntimeError(f"{name}: HTTP {response.code} {b''.join(parts)[:200]!r}")
+    return b"".join(parts)
+
+
+async def run_client(client, base, n, turns, samples):
+    video = json.loads(await request(client, samples, "ingest", f"{base}/videos",
+                                     {"url": f"https://www.youtube.com/watch?v=load{n:07d}"}))
+    video_id = video["video_id"]
+    await request(client, samples, "summary", f"{base}/videos/{video_id}/summary", {})
+    for turn in range(turns):
+        question = f"What does the video say about topic {turn} and word{(n * 31 + turn * 7) % 3000}?"
+        await request(client, samples, "chat", f"{base}/videos/{video_id}/chat",
+                      {"question": question, "stream": True}, first_byte="chat_first_byte")
+        await request(client, samples, "library", f"{base}/videos?limit=50")
+    await request(client, samples, "messages", f"{base}/videos/{video_id}/messages?limit=50")
+
+
+async def run(args, llm):
+    sock, port = tornado.testing.bind_unused_port()
+    server = tornado.httpserver.HTTPServer(api.make_app(llm))
+    server.add_sockets([sock])
+    base = f"http://127.0.0.1:{port}"
+
+    client = tornado.httpclient.AsyncHTTPClient(max_clients=args.clients)
+    samples = {}
+    start = time.perf_counter()
+    await asyncio.gather(*(run_client(client, base, n, args.turns, samples) for n in range(args.clients)))
+    elapsed = time.perf_counter() - start
+    server.stop()
+    client.close()
+
+    total = sum(len(s) for name, s in samples.items() if name != "chat_first_byte")
+    return {
+        "wall_s": round(elapsed, 3),
+        "requests": total,
+        "requests_per_s": round(total / elapsed, 3),
+        "endpoints": {name: percentiles(s) for name, s in sorted(samples.items())},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=32, help="concurrent clients, one video each")
+    parser.add_argument("--turns", type=int, default=5, help="chat turns per client")
+    parser.add_argument("--io-workers", type=int, default=api.IO_WORKERS)
+    parser.add_argument("--llm-workers", type=int, default=api.LLM_WORKERS)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    parser.add_argument("--transcript-minutes", type=float, default=20)
+    parser.add_argument("--title-latency", type=float, default=0.15)
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-input-tps", type=float, default=50_000.0, help="fake LLM prompt tokens/s")
+    parser.add_argument("--llm-output-tps", type=float, default=400.0, help="fake LLM generated tokens/s")
+    args = parser.parse_args()
+
+    api.io_pool = api.ThreadPoolExecutor(max_workers=args.io_workers, thread_name_prefix="api-io")
+    api.llm_pool = api.ThreadPoolExecutor(max_workers=args.llm_workers, thread_name_prefix="api-llm")
+    fakes = dict(llm=FakeChatModel(first_token_latency=args.llm_ttft, input_tokens_per_s=args.llm_input_tps,
+                                   output_tokens_per_s=args.llm_output_tps),
+                 transcript_api=FakeTranscriptApi(args.transcript_latency, args.transcript_minutes),
+                 http=FakeHttp(args.title_latency))
+
+    with tempfile.TemporaryDirectory() as tmp, installed(**fakes):
+        database.DB_NAME = os.path.join(tmp, "chat_history.db")
+        database.init_db()
+        try:
+            results = asyncio.run(run(args, get_model()))
+        finally:
+            database.close_connection()
+
+    results["config"] = {k: v for k, v in vars(args).items() if k != "output"}
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
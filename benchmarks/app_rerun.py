@@ -0,0 +1,70 @@
+"""
+Rerun-time benchmark for the Streamlit app.
+
+Drives `app.py` headlessly with Streamlit's AppTest and times repeated reruns
+of the chat page, which is what every widget interaction costs. A stand-in
+font file and a stored conversation are created so the font, CSS, database
+and LLM client paths are all exercised; no network calls are made. Run it on
+two checkouts to compare:
+
+    uv run python -m benchmarks.app_rerun --reruns 50
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import database
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+FONT_FILE = "JetBrainsMonoNerdFont-Regular.woff2"
+
+
+def seed(font_kb):
+    with open(FONT_FILE, "wb") as f:
+        f.write(os.urandom(font_kb * 1024))
+    database.DB_NAME = "chat_history.db"
+    database.init_db()
+    video_id = database.save_video("benchmark01", "Benchmark video", "lorem ipsum " * 2000)
+    database.add_messages(video_id, [("user", "Please summarize."),
+                                     ("ai", "A summary.\n\n**Suggested Questions:**\n1. One?\n2. Two?\n3. Three?")])
+    database.close_connection()
+    return video_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=50)
+    parser.add_argument("--font-kb", type=int, default=1200, help="size of the stand-in font file")
+    args = parser.parse_args()
+
+    # get_model() only builds a client when a key is present; it is never used to call the API here
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark-placeholder")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.py opens chat_history.db and the font relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            video_id = seed(args.font_kb)
+            at = AppTest.from_file(APP_FILE, default_timeout=60)
+            at.session_state["current_video_id"] = video_id
+            at.run()  # first run pays for imports and cache population
+            timings = []
+            for _ in range(args.reruns):
+                start = time.perf_counter()
+                at.run()
+                timings.append(time.perf_counter() - start)
+        finally:
+            os.chdir(cwd)
+
+    timings.sort()
+    print(f"reruns: {len(timings)}  p50 {statistics.median(timings) * 1000:.1f} ms  "
+          f"p95 {timings[int(len(timings) * 0.95) - 1] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
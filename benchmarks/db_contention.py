@@ -0,0 +1,118 @@
+"""
+Contention benchmark for the database layer.
+
+Compares the old connect-per-call access pattern against the connection pool
+in `database`, with several sessions each simulating Streamlit reruns (read
+library, read history, append a message). Like Streamlit, every rerun runs on
+a thread of its own.
+
+    uv run python -m benchmarks.db_contention --threads 8 --reruns 200
+"""
+import argparse
+import datetime
+import os
+import sqlite3
+import statistics
+import tempfile
+import threading
+import time
+
+import database
+
+
+def legacy_rerun(db_name, video_id):
+    # Mirrors the pre-pooling implementation: one connection per call, rollback journal.
+    def query(sql, args=()):
+        conn = sqlite3.connect(db_name)
+        rows = conn.execute(sql, args).fetchall()
+        conn.close()
+        return rows
+
+    query("SELECT id, youtube_id, title FROM videos ORDER BY created_at DESC")
+    query("SELECT id, youtube_id, title, transcript FROM videos WHERE id = ?", (video_id,))
+    query("SELECT role, content FROM messages WHERE video_id = ? ORDER BY timestamp ASC", (video_id,))
+    conn = sqlite3.connect(db_name, timeout=30)
+    conn.execute("INSERT INTO messages (video_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
+                 (video_id, "user", "benchmark message", datetime.datetime.now()))
+    conn.commit()
+    conn.close()
+
+
+def pooled_rerun(db_name, video_id):
+    database.get_all_videos()
+    database.get_video_by_id(video_id)
+    database.get_chat_history(video_id)
+    database.add_message(video_id, "user", "benchmark message")
+
+
+def seed(videos, transcript_chars):
+    database.init_db()
+    transcript = "lorem ipsum " * (transcript_chars // 12)
+    with database.transaction():
+        ids = [database.save_video(f"bench{i:06d}", f"Benchmark video {i}", transcript) for i in range(videos)]
+    database.close_connection()
+    return ids
+
+
+def run(mode, db_name, video_ids, threads, reruns):
+    rerun = legacy_rerun if mode == "legacy" else pooled_rerun
+    latencies = []
+    lock = threading.Lock()
+
+    def timed_rerun(video_id, local):
+        start = time.perf_counter()
+        rerun(db_name, video_id)
+        local.append(time.perf_counter() - start)
+
+    def worker(n):
+        local = []
+        for i in range(reruns):
+            # Streamlit starts a new script thread for every interaction
+            thread = threading.Thread(target=timed_rerun, args=(video_ids[(n + i) % len(video_ids)], local))
+            thread.start()
+            thread.join()
+        with lock:
+            latencies.extend(local)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    database.close_connection()
+
+    latencies.sort()
+    return {
+        "mode": mode,
+        "reruns_per_s": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(len(latencies) * 0.95) - 1] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--reruns", type=int, default=200, help="simulated reruns per session")
+    parser.add_argument("--videos", type=int, default=200)
+    parser.add_argument("--transcript-chars", type=int, default=20_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("legacy", "pooled"):
+            database.DB_NAME = os.path.join(tmp, f"{mode}.db")
+            ids = seed(args.videos, args.transcript_chars)
+            if mode == "legacy":
+                # The old layer never enabled WAL; measure it on its default journal.
+                conn = sqlite3.connect(database.DB_NAME)
+                conn.execute("PRAGMA journal_mode=DELETE")
+                conn.close()
+            result = run(mode, database.DB_NAME, ids, args.threads, args.reruns)
+            print(f"{result['mode']:>7}: {result['reruns_per_s']:8.1f} reruns/s  "
+                  f"p50 {result['p50_ms']:7.2f} ms  p95 {result['p95_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+"""
+Deterministic local stand-ins for the network backends used by the app.
+
+`FakeChatModel` is a LangChain chat model that sleeps for a configurable
+time-to-first-token plus per-token input/output time, and answers with text
+derived from the prompt, so the same input always produces the same output.
+`FakeTranscriptApi` and `FakeHttp` replace the transcript and title
+fetches, and `installed()` patches all three in where the app loads them.
+"""
+import hashlib
+import json
+import os
+import random
+import time
+from contextlib import ExitStack, contextmanager
+from unittest import mock
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+import langchain_google_genai
+from youtube_transcript_api import FetchedTranscript, FetchedTranscriptSnippet
+
+import summarizer
+import titles
+import transcripts
+
+VOCABULARY = [f"word{i}" for i in range(3000)] + ["the", "and", "of", "to", "a", "in", "is", "that"]
+
+
+class FakeChatModel(BaseChatModel):
+    first_token_latency: float = 0.3
+    """Seconds before any output, independent of prompt size."""
+    input_tokens_per_s: float = 50_000.0
+    """Prompt processing rate; long prompts take longer to first token."""
+    output_tokens_per_s: float = 200.0
+    """Generation rate once tokens start flowing."""
+    output_words: int = 80
+    """Length of each answer."""
+
+    @property
+    def _llm_type(self):
+        return "fake-chat"
+
+    def _answer(self, messages):
+        prompt = "\n".join(m.text for m in messages)
+        words = prompt.split()
+        seed = int(hashlib.sha256(prompt.encode("utf-8")).hexdigest(), 16)
+        picked = [words[(seed >> i) % len(words)] for i in range(self.output_words)] if words else ["ok"]
+        return (" ".join(picked) + "\n\n**Suggested Questions:**\n"
+                "1. What is the main point?\n2. Who is involved?\n3. What happens next?")
+
+    def _prefill_delay(self, messages):
+        prompt_tokens = sum(summarizer.estimate_tokens(m.text) for m in messages)
+        return self.first_token_latency + prompt_tokens / self.input_tokens_per_s
+
+    def _usage(self, messages, text):
+        prompt_tokens = sum(summarizer.estimate_tokens(m.text) for m in messages)
+        output_tokens = summarizer.estimate_tokens(text)
+        return {"input_tokens": prompt_tokens, "output_tokens": output_tokens,
+                "total_tokens": prompt_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._answer(messages)
+        time.sleep(self._prefill_delay(messages) + summarizer.estimate_tokens(text) / self.output_tokens_per_s)
+        message = AIMessage(content=text, usage_metadata=self._usage(messages, text))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        text = self._answer(messages)
+        time.sleep(self._prefill_delay(messages))
+        for word in text.split(" "):
+            piece = word + " "
+            time.sleep(summarizer.estimate_tokens(piece) / self.output_tokens_per_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=piece))
+            if run_manager:
+                run_manager.on_llm_new_token(piece, chunk=chunk)
+            yield chunk
+        # Like Gemini, report usage on a final empty chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, text)))
+
+
+class FakeTranscriptApi:
+    """
+    Stand-in for `YouTubeTranscriptApi`. `fetch` sleeps for `latency` seconds and
+    returns a deterministic transcript of about `minutes` of speech, in the same
+    `FetchedTranscript` shape the real API returns.
+    """
+
+    words_per_snippet = 8
+    snippets_per_minute = 20
+
+    def __init__(self, latency=0.2, minutes=20):
+        self.latency = latency
+        self.minutes = minutes
+
+    def fetch(self, video_id, languages=("en",), preserve_formatting=False):
+        time.sleep(self.latency)
+        rng = random.Random(video_id)
+        count = int(self.minutes * self.snippets_per_minute)
+        step = 60.0 / self.snippets_per_minute
+        snippets = [FetchedTranscriptSnippet(text=" ".join(rng.choice(VOCABULARY) for _ in range(self.words_per_snippet)),
+                                             start=i * step, duration=step)
+                    for i in range(count)]
+        return FetchedTranscript(snippets=snippets, video_id=video_id, language="English",
+                                 language_code="en", is_generated=True)
+
+
+class FakeResponse:
+    """Minimal `requests.Response`: body arrives at `bandwidth` bytes/s, all at once or via iter_content."""
+
+    def __init__(self, body, status_code=200, bandwidth=None, stream=False):
+        self._body = body.encode("utf-8")
+        self._bandwidth = bandwidth
+        self.status_code = status_code
+        if not stream:
+            self._transfer(len(self._body))
+
+    def _transfer(self, size):
+        if self._bandwidth:
+            time.sleep(size / self._bandwidth)
+
+    @property
+    def content(self):
+        return self._body
+
+    @property
+    def text(self):
+        return self._body.decode("utf-8")
+
+    def json(self):
+        return json.loads(self._body)
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self._body), chunk_size):
+            chunk = self._body[i:i + chunk_size]
+            self._transfer(len(chunk))
+            yield chunk
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FakeHttp:
+    """
+    Stand-in for the pooled `titles.session`. Each
+    `get` waits `latency` seconds, then serves either a small oEmbed JSON body
+    or a watch page padded to roughly `page_kb`, at `bandwidth_mb_s`.
+    """
+
+    def __init__(self, latency=0.15, page_kb=500, bandwidth_mb_s=10.0, oembed=True):
+        self.latency = latency
+        self.page_kb = page_kb
+        self.bandwidth = bandwidth_mb_s * 1_000_000
+        self.oembed = oembed
+
+    def get(self, url, params=None, timeout=None, stream=False, **kwargs):
+        time.sleep(self.latency)
+        if url.startswith(titles.OEMBED_URL):
+            if not self.oembed:
+                return FakeResponse("Not Found", 404)
+            video_id = params["url"].rsplit("v=", 1)[-1]
+            body = json.dumps({"title": f"Benchmark video {video_id}", "author_name": "Benchmark channel",
+                               "type": "video", "version": "1.0", "provider_name": "YouTube"})
+            return FakeResponse(body, bandwidth=self.bandwidth, stream=stream)
+        video_id = url.rsplit("v=", 1)[-1].split("&")[0]
+        padding = "<script>var ytInitialData = {};</script>" * (self.page_kb * 1024 // 40)
+        body = (f"<html><head><meta charset=\"utf-8\"><title>Benchmark video {video_id} - YouTube</title></head>"
+                f"<body>{padding}</body></html>")
+        return FakeResponse(body, bandwidth=self.bandwidth, stream=stream)
+
+
+@contextmanager
+def installed(llm=None, transcript_api=None, http=None):
+    """
+    Swaps the network backends used by `main`, `titles` and `transcripts` (and so `app.py` and
+    `ingest.py`) for the given fakes for the duration of the block.
+    """
+    llm = llm or FakeChatModel()
+    transcript_api = transcript_api or FakeTranscriptApi()
+    http = http or FakeHttp()
+    def make_llm(**kwargs):
+        # get_model passes the tracing callback; keep it so LLM stages are recorded
+        llm.callbacks = kwargs.get("callbacks")
+        return llm
+
+    with ExitStack() as stack:
+        # main imports the model class when it first needs it, so patch it where it is defined
+        stack.enter_context(mock.patch.object(langchain_google_genai, "ChatGoogleGenerativeAI", make_llm))
+        stack.enter_context(mock.patch.object(transcripts, "api", transcript_api))
+        stack.enter_context(mock.patch.object(titles, "session", http))
+        stack.enter_context(mock.patch.dict(os.environ, {"GOOGLE_API_KEY": os.environ.get("GOOGLE_API_KEY", "fake")}))
+        yield llm, transcript_api, http
@@ -0,0 +1,117 @@
+"""
+Import-time benchmark and budget check for the app's entry points.
+
+Each target is imported (or run) in a fresh interpreter `--runs` times under
+`python -X importtime`. The script reports the median cumulative import time of
+the target module and the slowest modules it pulled in, plus the wall time of
+`main.py --list`. It also checks that the heavy libraries (the Gemini client,
+LangChain, numpy, rich, requests) stay unloaded until they are first used.
+
+With `--check`, it exits with status 1 if any target is over its budget or
+imports a library it should not. Budgets are generous multiples of a warm run
+on a laptop, so a failure means a heavy import crept back in, not noise.
+
+    uv run python -m benchmarks.import_time
+    uv run python -m benchmarks.import_time --check --runs 7
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEAVY = ("langchain_google_genai", "langchain_core", "google.genai", "youtube_transcript_api",
+         "numpy", "rich", "requests", "tornado", "streamlit")
+
+# module: (budget in ms for its cumulative import time, heavy libraries it may load)
+TARGETS = {
+    "database": (60, ()),
+    "main": (150, ()),
+    "jobs": (200, ()),
+    "ingest": (200, ()),
+    "api": (500, ("tornado",)),
+}
+# Wall time of `python main.py --list`, interpreter startup included
+CLI_BUDGET_MS = 400
+
+
+def import_profile(module):
+    """
+    Returns (cumulative ms for `module`, {module it imported: cumulative ms}) from
+    one fresh interpreter. Interpreter startup (site and its .pth files) is left out.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    # Lines are in post-order; the target's imports are the ones since the previous top-level entry
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if name.strip() == module:
+            return int(cumulative) / 1000, modules
+        modules[name.strip()] = int(cumulative) / 1000
+        if not name.startswith("  "):
+            modules = {}
+    raise RuntimeError(f"{module} was not imported")
+
+
+def wall_ms(command, cwd):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, *command], cwd=cwd, capture_output=True, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh interpreters per target")
+    parser.add_argument("--top", type=int, default=5, help="slowest imported modules to list per target")
+    parser.add_argument("--check", action="store_true", help="exit 1 if a budget is exceeded")
+    args = parser.parse_args()
+
+    results = {"python": sys.version.split()[0], "targets": {}}
+    failures = []
+    for module, (budget, allowed) in TARGETS.items():
+        samples = []
+        for _ in range(args.runs):
+            total, modules = import_profile(module)
+            samples.append(total)
+        heavy = [name for name in HEAVY if name in modules and name not in allowed]
+        slowest = sorted(modules.items(), key=lambda item: -item[1])[:args.top]
+        median = statistics.median(samples)
+        results["targets"][module] = {
+            "median_ms": round(median, 1),
+            "budget_ms": budget,
+            "heavy_imports": heavy,
+            "slowest": {name: round(ms, 1) for name, ms in slowest},
+        }
+        if median > budget:
+            failures.append(f"import {module}: {median:.0f} ms > {budget} ms")
+        if heavy:
+            failures.append(f"import {module} loads {', '.join(heavy)}")
+
+    # main.py --list opens chat_history.db in the working directory; use an empty one
+    with tempfile.TemporaryDirectory() as tmp:
+        baseline = statistics.median(wall_ms(["-c", "pass"], tmp) for _ in range(args.runs))
+        wall = statistics.median(wall_ms([os.path.join(ROOT, "main.py"), "--list"], tmp) for _ in range(args.runs))
+    results["cli_list"] = {"median_ms": round(wall, 1), "interpreter_ms": round(baseline, 1),
+                           "budget_ms": CLI_BUDGET_MS}
+    if wall > CLI_BUDGET_MS:
+        failures.append(f"main.py --list: {wall:.0f} ms > {CLI_BUDGET_MS} ms")
+
+    results["failures"] = failures
+    print(json.dumps(results, indent=2))
+    if args.check and failures:
+        for failure in failures:
+            print(f"over budget: {failure}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
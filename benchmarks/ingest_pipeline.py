@@ -0,0 +1,68 @@
+"""
+Ingestion latency benchmark: serial fetches against `main.ingest_video`.
+
+The serial path is what app.py did before: fetch the transcript, then the
+title, then save and index the video, then (on the next rerun) condense a long
+transcript for the summary prompt. Both paths run against the local fakes and
+are timed until the summary prompt's context is ready.
+
+    uv run python -m benchmarks.ingest_pipeline --videos 10 --minutes 20 240
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import database
+import main as core
+import retrieval
+from benchmarks.fakes import FakeChatModel, FakeHttp, FakeTranscriptApi, installed
+
+
+def serial(url, llm):
+    transcript = core.get_transcript(url)
+    title = core.get_video_title(url)
+    db_id = database.save_video(core.extract_video_id(url), title, transcript)
+    retrieval.index_video(db_id, transcript)
+    core.summary_context(llm, transcript)
+    return db_id
+
+
+def pipelined(url, llm):
+    return core.ingest_video(url, llm)[0]
+
+
+def mean_ms(ingest, llm, prefix, videos):
+    start = time.perf_counter()
+    for i in range(videos):
+        ingest(f"https://www.youtube.com/watch?v={prefix}{i:05d}", llm)
+    return (time.perf_counter() - start) * 1000 / videos
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=10, help="videos per configuration")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[20, 240], help="transcript lengths")
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    parser.add_argument("--title-latency", type=float, default=0.15)
+    args = parser.parse_args()
+
+    llm = FakeChatModel(output_words=40)
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.init_db()
+        try:
+            for minutes in args.minutes:
+                fakes = dict(llm=llm, transcript_api=FakeTranscriptApi(args.transcript_latency, minutes),
+                             http=FakeHttp(args.title_latency))
+                with installed(**fakes):
+                    before = mean_ms(serial, llm, f"s{minutes:g}m", args.videos)
+                    after = mean_ms(pipelined, llm, f"p{minutes:g}m", args.videos)
+                print(f"{minutes:g} min transcript: serial {before:7.1f} ms/video  "
+                      f"pipelined {after:7.1f} ms/video  ({before / after:.2f}x)")
+        finally:
+            database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Map-reduce summarization benchmark against the local fake LLM.
+
+Times the single-call summary of a long synthetic transcript against
+`summarizer.condense` followed by the summary call, across worker counts.
+
+    uv run python -m benchmarks.map_reduce --words 30000 --workers 1 4 8
+"""
+import argparse
+import random
+import time
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+import summarizer
+from benchmarks.fakes import FakeChatModel
+from main import SYSTEM_PROMPT, SUMMARY_REQUEST
+
+
+def synthetic_transcript(words, seed=0):
+    rng = random.Random(seed)
+    vocab = [f"word{i}" for i in range(3000)]
+    return " ".join(rng.choice(vocab) for _ in range(words))
+
+
+def summary_call(llm, context):
+    return llm.invoke([SystemMessage(content=SYSTEM_PROMPT.format(transcript=context)),
+                       HumanMessage(content=SUMMARY_REQUEST)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--words", type=int, default=30_000, help="transcript length (~3h of speech is 30k words)")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 4, 8])
+    parser.add_argument("--window-tokens", type=int, default=summarizer.WINDOW_TOKENS)
+    # A slow prefill makes the cost of one huge prompt visible, as with a real hosted model
+    parser.add_argument("--input-tokens-per-s", type=float, default=5_000.0)
+    args = parser.parse_args()
+
+    llm = FakeChatModel(input_tokens_per_s=args.input_tokens_per_s)
+    transcript = synthetic_transcript(args.words)
+    print(f"transcript: {args.words} words, ~{summarizer.estimate_tokens(transcript)} tokens, "
+          f"{len(summarizer.split_windows(transcript, args.window_tokens))} windows")
+
+    start = time.perf_counter()
+    summary_call(llm, transcript)
+    single = time.perf_counter() - start
+    print(f"single call:            {single:6.2f} s")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        notes = summarizer.condense(llm, transcript, args.window_tokens, workers)
+        summary_call(llm, notes)
+        elapsed = time.perf_counter() - start
+        print(f"map-reduce, {workers:2d} workers: {elapsed:6.2f} s  ({single / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Library search benchmark.
+
+Fills a temporary database with synthetic videos (transcript plus a short
+chat each) and times `database.search` for single-word, multi-word and
+title queries.
+
+    uv run python -m benchmarks.search --videos 10000 --minutes 20
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import database
+from benchmarks.fakes import FakeTranscriptApi
+
+
+def seed(videos, minutes):
+    api = FakeTranscriptApi(latency=0, minutes=minutes)
+    for start in range(0, videos, 500):
+        with database.transaction():
+            for i in range(start, min(start + 500, videos)):
+                video_id = f"search{i:05d}"
+                transcript = " ".join(s.text for s in api.fetch(video_id))
+                db_id = database.save_video(video_id, f"Search benchmark video {i}", transcript)
+                database.add_messages(db_id, [("user", f"What is word{i % 3000} about?"),
+                                              ("ai", f"It explains word{(i * 7) % 3000} and word{(i * 13) % 3000}.")])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=10_000)
+    parser.add_argument("--minutes", type=float, default=20, help="transcript length per video")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    queries = {
+        "one word": "word2999",
+        "common word": "the",
+        "two words": "word17 word42",
+        "title": "benchmark video 4242",
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DB_NAME = os.path.join(tmp, "bench.db")
+        database.init_db()
+        try:
+            start = time.perf_counter()
+            seed(args.videos, args.minutes)
+            print(f"seeded {args.videos} videos in {time.perf_counter() - start:.1f} s "
+                  f"({os.path.getsize(database.DB_NAME) / 1e6:.0f} MB)")
+            for name, query in queries.items():
+                database.search(query)  # warm the page cache
+                samples = []
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    results = database.search(query)
+                    samples.append((time.perf_counter() - start) * 1000)
+                samples.sort()
+                print(f"{name:12s} {query!r:24s} {len(results):3d} results  "
+                      f"p50 {samples[len(samples) // 2]:6.2f} ms  max {samples[-1]:6.2f} ms")
+        finally:
+            database.close_connection()
+
+
+if __name__ == "__main__":
+    main()
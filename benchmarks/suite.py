@@ -0,0 +1,181 @@
+"""
+Offline end-to-end benchmark suite.
+
+Runs the app's real code paths against the local fakes in `benchmarks.fakes`
+(no YouTube or Gemini traffic) and prints machine-readable results: latency
+percentiles in milliseconds and throughput per scenario.
+
+Scenarios:
+  ingest         main.ingest_video (transcript, title, chunk index, save), per video
+  first_summary  opening a fresh video in app.py until its summary is stored
+  chat           a 50-turn conversation through app.py's chat input
+  library        sidebar/library queries and an app.py rerun with 10k stored videos
+
+    uv run python -m benchmarks.suite --output bench.json
+    uv run python -m benchmarks.suite --scenarios chat --turns 20 --llm-ttft 0.5
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+import database
+import main as core
+from benchmarks.fakes import FakeChatModel, FakeHttp, FakeTranscriptApi, installed
+
+APP_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+SCENARIOS = ("ingest", "first_summary", "chat", "library")
+
+
+def percentiles(samples):
+    """Nearest-rank percentiles (ms) plus count and throughput for a list of durations in seconds."""
+    ordered = sorted(samples)
+
+    def pick(p):
+        return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))] * 1000
+
+    total = sum(ordered)
+    return {
+        "count": len(ordered),
+        "p50_ms": round(pick(50), 3),
+        "p90_ms": round(pick(90), 3),
+        "p95_ms": round(pick(95), 3),
+        "p99_ms": round(pick(99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+        "throughput_per_s": round(len(ordered) / total, 3) if total else None,
+    }
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+def ingest_video(video_id):
+    return core.ingest_video(f"https://www.youtube.com/watch?v={video_id}")[0]
+
+
+def open_app(video_id):
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.session_state["current_video_id"] = video_id
+    return at
+
+
+def check(at):
+    if at.exception:
+        raise RuntimeError(f"app.py raised: {at.exception[0].message}")
+
+
+def run_ingest(args):
+    return percentiles([timed(ingest_video, f"ingest{i:06d}")[0] for i in range(args.videos)])
+
+
+def run_first_summary(args):
+    samples = []
+    for i in range(args.summaries):
+        db_id = ingest_video(f"summary{i:05d}")
+        at = open_app(db_id)
+        elapsed, _ = timed(at.run)
+        check(at)
+        if database.get_video_summary(db_id) is None:
+            raise RuntimeError("first_summary: no summary was stored")
+        samples.append(elapsed)
+    return percentiles(samples)
+
+
+def run_chat(args):
+    db_id = ingest_video("chat000001")
+    at = open_app(db_id)
+    at.run()  # generates the initial summary
+    check(at)
+    samples = []
+    for turn in range(args.turns):
+        at.chat_input[0].set_value(f"What does the video say about topic {turn} and word{turn * 7}?")
+        elapsed, _ = timed(at.run)
+        check(at)
+        samples.append(elapsed)
+    return percentiles(samples)
+
+
+def run_library(args):
+    existing = len(database.get_all_videos())
+    with database.transaction():
+        for i in range(existing, args.library):
+            database.save_video(f"lib{i:07d}", f"Library video {i}", "short transcript " * 20)
+
+    first_page = [timed(database.get_videos_page, 50)[0] for _ in range(50)]
+    all_videos = [timed(database.get_all_videos)[0] for _ in range(10)]
+
+    at = AppTest.from_file(APP_FILE, default_timeout=600)
+    at.run()
+    check(at)
+    reruns = [timed(at.run)[0] for _ in range(args.reruns)]
+    return {
+        "videos": args.library,
+        "videos_page": percentiles(first_page),
+        "get_all_videos": percentiles(all_videos),
+        "app_rerun": percentiles(reruns),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--videos", type=int, default=20, help="ingest: videos to ingest")
+    parser.add_argument("--summaries", type=int, default=5, help="first_summary: videos to open")
+    parser.add_argument("--turns", type=int, default=50, help="chat: conversation length")
+    parser.add_argument("--library", type=int, default=10_000, help="library: stored videos")
+    parser.add_argument("--reruns", type=int, default=20, help="library: app reruns to time")
+    parser.add_argument("--transcript-latency", type=float, default=0.2)
+    parser.add_argument("--transcript-minutes", type=float, default=20)
+    parser.add_argument("--title-latency", type=float, default=0.15)
+    parser.add_argument("--llm-ttft", type=float, default=0.3, help="fake LLM seconds to first token")
+    parser.add_argument("--llm-input-tps", type=float, default=50_000.0, help="fake LLM prompt tokens/s")
+    parser.add_argument("--llm-output-tps", type=float, default=400.0, help="fake LLM generated tokens/s")
+    args = parser.parse_args()
+
+    llm = FakeChatModel(first_token_latency=args.llm_ttft, input_tokens_per_s=args.llm_input_tps,
+                        output_tokens_per_s=args.llm_output_tps)
+    fakes = dict(llm=llm,
+                 transcript_api=FakeTranscriptApi(args.transcript_latency, args.transcript_minutes),
+                 http=FakeHttp(args.title_latency))
+
+    results = {
+        "config": {k: v for k, v in vars(args).items() if k != "output"},
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "scenarios": {},
+    }
+    runners = {"ingest": run_ingest, "first_summary": run_first_summary, "chat": run_chat, "library": run_library}
+
+    with tempfile.TemporaryDirectory() as tmp, installed(**fakes):
+        # app.py opens chat_history.db relative to the working directory
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        try:
+            database.DB_NAME = "chat_history.db"
+            database.init_db()
+            for name in SCENARIOS:
+                if name in args.scenarios:
+                    results["scenarios"][name] = runners[name](args)
+                    print(f"{name}: done", file=sys.stderr)
+        finally:
+            database.close_connection()
+            os.chdir(cwd)
+
+    text = json.dumps(results, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Title lookup benchmark against a local fake of YouTube.
+
+Compares the previous approach (download the whole watch page, parse it all,
+read <title>) with `titles.get_title` via oEmbed and via its streamed page
+fallback, reporting time and bytes per lookup for sequential and concurrent runs.
+The previous parse used BeautifulSoup's "html.parser" backend, which is built
+on the standard library parser used here.
+
+    uv run python -m benchmarks.title_lookup --videos 40 --threads 8
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from html.parser import HTMLParser
+from unittest import mock
+
+import titles
+from benchmarks.fakes import FakeHttp
+
+
+class _TitleParser(HTMLParser):
+    def __init__(self):
+        super().__init__()
+        self.title, self._in_title = "", False
+
+    def handle_starttag(self, tag, attrs):
+        self._in_title = tag == "title"
+
+    def handle_endtag(self, tag):
+        self._in_title = False
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+
+
+def full_page_title(http, video_id, downloaded):
+    r = http.get(titles.WATCH_URL.format(video_id=video_id))
+    downloaded.append(len(r.content))
+    parser = _TitleParser()
+    parser.feed(r.text)
+    return parser.title.replace(" - YouTube", "")
+
+
+def resolver_title(http, video_id, downloaded):
+    return titles.get_title(video_id)
+
+
+def run(lookup, http, video_ids, threads):
+    titles._cache.clear()
+    downloaded, before = [], titles.stats()["bytes"]
+    start = time.perf_counter()
+    with mock.patch.object(titles, "session", http), ThreadPoolExecutor(max_workers=threads) as pool:
+        results = list(pool.map(lambda vid: lookup(http, vid, downloaded), video_ids))
+    elapsed = time.perf_counter() - start
+    if any(title != f"Benchmark video {vid}" for title, vid in zip(results, video_ids)):
+        raise RuntimeError("wrong title returned")
+    total_bytes = sum(downloaded) + titles.stats()["bytes"] - before
+    return elapsed, total_bytes / len(video_ids)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--videos", type=int, default=40)
+    parser.add_argument("--threads", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--latency", type=float, default=0.15, help="fake round-trip seconds")
+    parser.add_argument("--page-kb", type=int, default=700, help="size of a watch page")
+    parser.add_argument("--bandwidth", type=float, default=10.0, help="fake download MB/s")
+    args = parser.parse_args()
+
+    video_ids = [f"title{i:06d}" for i in range(args.videos)]
+    with_oembed = FakeHttp(args.latency, args.page_kb, args.bandwidth)
+    page_only = FakeHttp(args.latency, args.page_kb, args.bandwidth, oembed=False)
+    cases = (("full page + parse", full_page_title, with_oembed),
+             ("oembed", resolver_title, with_oembed),
+             ("streamed page head", resolver_title, page_only))
+
+    for threads in args.threads:
+        print(f"{args.videos} lookups, {threads} threads:")
+        for name, lookup, http in cases:
+            elapsed, avg_bytes = run(lookup, http, video_ids, threads)
+            print(f"  {name:20s} {elapsed * 1000 / args.videos:8.1f} ms/lookup  "
+                  f"{args.videos / elapsed:6.1f} lookups/s  {avg_bytes / 1024:8.1f} KiB/lookup")
+
+
+if __name__ == "__main__":
+    main()
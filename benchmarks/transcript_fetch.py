@@ -0,0 +1,126 @@
+"""
+Checks for the shared transcript fetch layer (`transcripts.get`) against the
+fake YouTube client:
+
+  - flaky:    a video whose first fetches fail with network errors is fetched
+              after retries;
+  - private:  a private video fails once, and the next call is answered from
+              the remembered failure without going back to YouTube;
+  - merged:   concurrent calls for one video make a single fetch;
+  - stored:   a library video stored without segments (ingested before they
+              were kept, or imported without them) is read from the library.
+
+Prints one line per check with the fetches it made and its wall time; exits
+with status 1 if any check fails. Backoff delays are shortened so it runs in
+a couple of seconds.
+
+    uv run python -m benchmarks.transcript_fetch --callers 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+
+import requests
+import youtube_transcript_api as yta
+
+import database
+import transcripts
+from benchmarks.fakes import FakeTranscriptApi, installed
+
+
+class ScriptedTranscriptApi(FakeTranscriptApi):
+    """FakeTranscriptApi that counts fetches per video and raises the errors queued in `errors[video_id]` first."""
+
+    def __init__(self, latency=0.05, minutes=5, errors=None):
+        super().__init__(latency, minutes)
+        self.errors = errors or {}
+        self.calls = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, video_id, languages=("en",), preserve_formatting=False):
+        with self._lock:
+            self.calls[video_id] = self.calls.get(video_id, 0) + 1
+            queued = self.errors.get(video_id)
+            error = queued.pop(0) if queued else None
+        if error is not None:
+            time.sleep(self.latency)
+            raise error
+        return super().fetch(video_id, languages, preserve_formatting)
+
+
+def check_flaky(api):
+    video_id = "flaky000001"
+    api.errors[video_id] = [requests.ConnectionError("connection reset")] * (transcripts.ATTEMPTS - 1)
+    fetched = transcripts.get(video_id)
+    return bool(fetched.text) and api.calls[video_id] == transcripts.ATTEMPTS, api.calls[video_id]
+
+
+def check_private(api):
+    video_id = "private0001"
+    api.errors[video_id] = [yta.VideoUnavailable(video_id)] * 2
+    failed = 0
+    for _ in range(2):
+        try:
+            transcripts.get(video_id)
+        except transcripts.TranscriptUnavailable:
+            failed += 1
+    remembered = database.get_transcript_failure(video_id) is not None
+    return failed == 2 and remembered and api.calls[video_id] == 1, api.calls[video_id]
+
+
+def check_merged(api, callers):
+    video_id = "merged00001"
+    barrier = threading.Barrier(callers)
+
+    def call(_):
+        barrier.wait()
+        return transcripts.get(video_id).text
+
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        texts = list(pool.map(call, range(callers)))
+    return len(set(texts)) == 1 and api.calls[video_id] == 1, api.calls[video_id]
+
+
+def check_stored(api):
+    video_id = "stored00001"
+    database.save_video(video_id, "Stored video", "the transcript as stored")
+    texts = {transcripts.get(video_id).text for _ in range(3)}
+    return texts == {"the transcript as stored"} and video_id not in api.calls, api.calls.get(video_id, 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--callers", type=int, default=8, help="concurrent calls in the merged check")
+    parser.add_argument("--latency", type=float, default=0.3, help="fake fetch seconds")
+    args = parser.parse_args()
+
+    api = ScriptedTranscriptApi(latency=args.latency)
+    checks = (("flaky", lambda: check_flaky(api)),
+              ("private", lambda: check_private(api)),
+              (f"merged x{args.callers}", lambda: check_merged(api, args.callers)),
+              ("stored", lambda: check_stored(api)))
+    failures = 0
+    with tempfile.TemporaryDirectory() as tmp, installed(transcript_api=api), \
+            mock.patch.object(transcripts, "backoff", lambda attempt: 0.01):
+        database.DB_NAME = os.path.join(tmp, "chat_history.db")
+        database.init_db()
+        for name, check in checks:
+            before = transcripts.stats()
+            start = time.perf_counter()
+            ok, fetches = check()
+            elapsed = time.perf_counter() - start
+            after = transcripts.stats()
+            counters = ", ".join(f"{key} +{after[key] - before[key]}" for key in after if after[key] != before[key])
+            print(f"{'ok  ' if ok else 'FAIL'} {name:12s} {fetches} fetches  {elapsed * 1000:7.1f} ms  ({counters})")
+            failures += not ok
+        database.close_connection()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
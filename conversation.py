@@ -0,0 +1,101 @@
+import database
+import tokens
+from summarizer import estimate_tokens
+
+# Most recent messages kept verbatim in every prompt
+KEEP_MESSAGES = 6
+# Token budget for those verbatim messages
+TOKEN_BUDGET = 4_000
+# Older messages are folded into the running summary in batches of at least
+# this many, so compaction costs one extra LLM call every few turns, not every turn
+FOLD_MIN_MESSAGES = 6
+
+FOLD_PROMPT = """You maintain a running summary of a conversation about a video.
+Update the summary with the new exchanges below. Keep facts, answers given and
+open questions; drop pleasantries and the suggested-question lists. Stay under 250 words.
+
+Current summary:
+{summary}
+
+New exchanges:
+{exchanges}"""
+
+
+def _tail_start(turns, keep, budget):
+    """Index of the first message of the verbatim tail of `turns`."""
+    start, used = len(turns), 0
+    while start > 0 and len(turns) - start < keep:
+        cost = estimate_tokens(turns[start - 1][1])
+        # The newest message is always kept, whatever its size
+        if start < len(turns) and used + cost > budget:
+            break
+        used += cost
+        start -= 1
+    # Start on a user turn so the model never sees an answer without its question
+    while start < len(turns) - 1 and turns[start][0] != "user":
+        start += 1
+    return start
+
+
+def fold(llm, summary, turns, usage=None):
+    """Returns `summary` updated with `turns` ([(role, content), ...]). The call's tokens are added to `usage`."""
+    from langchain_core.messages import HumanMessage
+    exchanges = "\n\n".join(f"{'User' if role == 'user' else 'Assistant'}: {content}" for role, content in turns)
+    prompt = FOLD_PROMPT.format(summary=summary or "(none yet)", exchanges=exchanges)
+    messages = [HumanMessage(content=prompt)]
+    response = llm.invoke(messages)
+    tokens.add_response_usage(usage, messages, response)
+    return response.text
+
+
+def compact(llm, summary, turns, keep=KEEP_MESSAGES, budget=TOKEN_BUDGET, fold_min=FOLD_MIN_MESSAGES, usage=None):
+    """
+    Splits a conversation into (summary, recent turns) for the prompt.
+
+    `turns` are the messages not yet covered by `summary`. When enough of them
+    fall outside the verbatim window they are folded into the summary; returns
+    (new_summary, folded_count, recent_turns).
+    """
+    start = _tail_start(turns, keep, budget)
+    older = turns[:start]
+    if not older:
+        return summary, 0, turns
+    if len(older) < fold_min and sum(estimate_tokens(c) for _, c in older) <= budget // 4:
+        # Not worth a fold yet; keep them verbatim a little longer
+        return summary, 0, turns
+    return fold(llm, summary, older, usage), len(older), turns[start:]
+
+
+def load_compacted(llm, video_id, usage=None):
+    """
+    Returns (summary, [(role, content), ...]) for a stored chat, folding aged-out
+    messages into the persisted running summary first. Only messages newer than
+    the summary are read, so the cost per turn stays flat as the chat grows.
+    The fold's tokens are added to `usage` (see tokens.add_usage) if given.
+    """
+    summary, covered_id = database.get_conversation_summary(video_id)
+    rows = database.get_messages(video_id, after_id=covered_id)
+    turns = [(role, content) for _, role, content in rows]
+    summary, folded, recent = compact(llm, summary, turns, usage=usage)
+    if folded:
+        database.save_conversation_summary(video_id, summary, rows[folded - 1][0])
+    return summary, recent
+
+
+def to_messages(system_instruction, summary, turns):
+    """Builds the LLM message list: system prompt (plus running summary) followed by the recent turns."""
+    from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+    if summary:
+        system_instruction = f"{system_instruction}\nEarlier in this conversation (summarized):\n{summary}\n"
+    messages = [SystemMessage(content=system_instruction)]
+    for role, content in turns:
+        if role == "user":
+            messages.append(HumanMessage(content=content))
+        else:
+            messages.append(AIMessage(content=content))
+    return messages
+
+
+def cache_history(summary, turns):
+    """The conversation as the response cache should see it: running summary, then recent turns."""
+    return ([("summary", summary)] if summary else []) + list(turns)
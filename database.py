@@ -1,82 +1,1025 @@
 import sqlite3
 import datetime
+import hashlib
+import queue
+import re
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import tokens
+import tracing
 
 DB_NAME = "chat_history.db"
 
+# Applied to every new connection. WAL lets readers run alongside a writer,
+# and synchronous=NORMAL is durable enough for WAL while avoiding an fsync per commit.
+# auto_vacuum lets maintenance.py hand freed pages back with incremental vacuum. It
+# must come before journal_mode, which writes the file header: it only takes effect
+# on a database with no pages yet. maintenance converts older ones with a full VACUUM.
+PRAGMAS = (
+    "PRAGMA auto_vacuum=INCREMENTAL",
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-16000",
+    "PRAGMA busy_timeout=5000",
+)
+
+# Idle connections shared by every thread, as (database name, connection). Streamlit
+# runs each rerun on a new thread, so connections are lent out per call or per
+# transaction instead of being kept per thread.
+POOL_SIZE = 16
+_pool = queue.LifoQueue()
+# `conn`: the connection this thread holds while inside connection(); `depth`: how many
+# transaction() blocks it is in
+_local = threading.local()
+
+def _open():
+    # isolation_level=None: we issue BEGIN/COMMIT ourselves in transaction().
+    # check_same_thread=False: a pooled connection is used by one thread at a time, not always the same one
+    conn = sqlite3.connect(DB_NAME, timeout=5.0, isolation_level=None, check_same_thread=False)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def _checkout():
+    while True:
+        try:
+            db_name, conn = _pool.get_nowait()
+        except queue.Empty:
+            return DB_NAME, _open()
+        if db_name == DB_NAME:
+            return db_name, conn
+        conn.close()
+
+def _checkin(db_name, conn):
+    if conn.in_transaction:
+        conn.execute("ROLLBACK")
+    if db_name == DB_NAME and _pool.qsize() < POOL_SIZE:
+        _pool.put((db_name, conn))
+    else:
+        conn.close()
+
+@contextmanager
+def connection():
+    """
+    Lends a pooled connection for the enclosed statements, opening one if none is idle.
+    Nested uses on the same thread (including those inside transaction() or snapshot())
+    get the connection already lent, so they see its uncommitted writes.
+    A new connection is opened if DB_NAME has changed since the idle ones were.
+    """
+    held = getattr(_local, "conn", None)
+    if held is not None:
+        yield held
+        return
+    db_name, conn = _checkout()
+    _local.conn = conn
+    try:
+        yield conn
+    finally:
+        _local.conn = None
+        _checkin(db_name, conn)
+
+def close_connection():
+    """Closes the pool's idle connections, e.g. before deleting the database file."""
+    while True:
+        try:
+            _, conn = _pool.get_nowait()
+        except queue.Empty:
+            return
+        conn.close()
+
+@contextmanager
+def transaction():
+    """
+    Runs the enclosed writes in a single transaction on one pooled connection.
+    Nested uses join the outermost transaction, so several writes can be batched
+    into one commit by wrapping them in `with database.transaction():`.
+    """
+    if getattr(_local, "depth", 0):
+        _local.depth += 1
+        try:
+            yield _local.conn
+        finally:
+            _local.depth -= 1
+        return
+
+    with connection() as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        _local.depth = 1
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        else:
+            conn.execute("COMMIT")
+        finally:
+            _local.depth = 0
+
 def init_db():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    # Table for storing video metadata
-    c.execute('''CREATE TABLE IF NOT EXISTS videos
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  youtube_id TEXT UNIQUE,
-                  title TEXT,
-                  transcript TEXT,
-                  created_at TIMESTAMP)''')
-    
-    # Table for storing chat messages
-    c.execute('''CREATE TABLE IF NOT EXISTS messages
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  video_id INTEGER,
-                  role TEXT,
-                  content TEXT,
-                  timestamp TIMESTAMP,
-                  FOREIGN KEY(video_id) REFERENCES videos(id))''')
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        c = conn.cursor()
+        # Table for storing video metadata
+        c.execute('''CREATE TABLE IF NOT EXISTS videos
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      youtube_id TEXT UNIQUE,
+                      title TEXT,
+                      transcript TEXT,
+                      created_at TIMESTAMP)''')
+
+        # Table for storing chat messages
+        c.execute('''CREATE TABLE IF NOT EXISTS messages
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      video_id INTEGER,
+                      role TEXT,
+                      content TEXT,
+                      timestamp TIMESTAMP,
+                      FOREIGN KEY(video_id) REFERENCES videos(id))''')
+    migrate()
+
+# --- Schema Migrations ---
+# Each entry upgrades the schema by one version; PRAGMA user_version records
+# how many have been applied. Only ever append to this list.
+
+def _add_query_indexes(conn):
+    # Chat history: seek to one video's messages in timestamp order.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_video_ts ON messages (video_id, timestamp, id)")
+    # Library sidebar: covers the whole page query so it never touches the table.
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_created ON videos (created_at DESC, id DESC, youtube_id, title)")
+
+def _compress_transcripts(conn):
+    # Transcripts move out of `videos` into their own compressed table, so listing
+    # or opening a video no longer drags megabytes of text through the page cache.
+    conn.execute('''CREATE TABLE IF NOT EXISTS transcripts
+                    (video_id INTEGER PRIMARY KEY,
+                     data BLOB,
+                     size INTEGER,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
+    conn.create_function("compress_transcript", 1, _compress, deterministic=True)
+    conn.execute("INSERT OR REPLACE INTO transcripts (video_id, data, size) "
+                 "SELECT id, compress_transcript(transcript), length(transcript) FROM videos WHERE transcript IS NOT NULL")
+    conn.execute("UPDATE videos SET transcript = NULL WHERE transcript IS NOT NULL")
+
+def _add_chunk_indexes(conn):
+    # Serialized retrieval.ChunkIndex per video (chunks + BM25 postings).
+    conn.execute('''CREATE TABLE IF NOT EXISTS chunk_indexes
+                    (video_id INTEGER PRIMARY KEY,
+                     data BLOB,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
+
+def _add_response_cache(conn):
+    # LLM answers keyed by response_cache.make_key(); see response_cache.py
+    conn.execute('''CREATE TABLE IF NOT EXISTS response_cache
+                    (key TEXT PRIMARY KEY,
+                     youtube_id TEXT,
+                     model TEXT,
+                     response TEXT,
+                     size INTEGER,
+                     created_at REAL,
+                     last_used REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_response_cache_last_used ON response_cache (last_used)")
+
+def _add_conversation_summaries(conn):
+    # Running summary of each chat, covering messages up to covered_message_id (see conversation.py)
+    conn.execute('''CREATE TABLE IF NOT EXISTS conversation_summaries
+                    (video_id INTEGER PRIMARY KEY,
+                     summary TEXT,
+                     covered_message_id INTEGER,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
+
+def _add_search_index(conn):
+    # Full-text index over titles, transcripts and chat messages. It is contentless
+    # (the text stays in its own tables, transcripts compressed) and keyed by rowid:
+    #   message id          -> that message
+    #   -2 * video id       -> the video's title
+    #   -2 * video id - 1   -> the video's transcript
+    # Deleting from a contentless table needs contentless_delete (SQLite 3.43+). Older
+    # versions get an ordinary FTS5 table: it keeps its own copy of the text, but takes
+    # the same inserts and deletes.
+    contentless = "content='', contentless_delete=1, " if sqlite3.sqlite_version_info >= (3, 43) else ""
+    conn.execute("CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5"
+                 f"(title, transcript, message, {contentless}tokenize='unicode61')")
+    # Titles and messages are kept in sync by triggers; transcripts by save_transcript
+    for trigger in (
+        """CREATE TRIGGER IF NOT EXISTS search_video_insert AFTER INSERT ON videos BEGIN
+               INSERT INTO search_index (rowid, title) VALUES (-2 * NEW.id, NEW.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS search_video_update AFTER UPDATE OF title ON videos BEGIN
+               DELETE FROM search_index WHERE rowid = -2 * OLD.id;
+               INSERT INTO search_index (rowid, title) VALUES (-2 * NEW.id, NEW.title);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS search_video_delete AFTER DELETE ON videos BEGIN
+               DELETE FROM search_index WHERE rowid = -2 * OLD.id;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS search_transcript_delete AFTER DELETE ON transcripts BEGIN
+               DELETE FROM search_index WHERE rowid = -2 * OLD.video_id - 1;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS search_message_insert AFTER INSERT ON messages BEGIN
+               INSERT INTO search_index (rowid, message) VALUES (NEW.id, NEW.content);
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS search_message_delete AFTER DELETE ON messages BEGIN
+               DELETE FROM search_index WHERE rowid = OLD.id;
+           END""",
+    ):
+        conn.execute(trigger)
+    conn.create_function("decompress_transcript", 1, _decompress, deterministic=True)
+    conn.execute("INSERT INTO search_index (rowid, title) SELECT -2 * id, title FROM videos")
+    conn.execute("INSERT INTO search_index (rowid, transcript) "
+                 "SELECT -2 * video_id - 1, decompress_transcript(data) FROM transcripts WHERE data IS NOT NULL")
+    conn.execute("INSERT INTO search_index (rowid, message) SELECT id, content FROM messages")
+
+def _add_transcript_segments(conn):
+    # Serialized segments.Segments arrays per video (start, duration, text/word offsets);
+    # the text they index is the video's row in `transcripts`.
+    conn.execute('''CREATE TABLE IF NOT EXISTS transcript_segments
+                    (video_id INTEGER PRIMARY KEY,
+                     data BLOB,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
+
+def _add_jobs(conn):
+    # Durable background work (see jobs.py). `state` is queued -> running -> done | failed;
+    # a running job belongs to lease_owner until lease_expires, after which another worker may take it.
+    conn.execute('''CREATE TABLE IF NOT EXISTS jobs
+                    (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                     kind TEXT,
+                     payload TEXT,
+                     dedupe_key TEXT,
+                     state TEXT,
+                     attempts INTEGER,
+                     max_attempts INTEGER,
+                     run_after REAL,
+                     lease_owner TEXT,
+                     lease_expires REAL,
+                     result TEXT,
+                     error TEXT,
+                     created_at REAL,
+                     updated_at REAL)''')
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, run_after, id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_dedupe ON jobs (dedupe_key, id)")
+
+def _add_transcript_failures(conn):
+    # Permanent transcript fetch failures (captions disabled, private video, ...) per YouTube ID,
+    # so transcripts.get can fail fast instead of asking YouTube again
+    conn.execute('''CREATE TABLE IF NOT EXISTS transcript_failures
+                    (youtube_id TEXT PRIMARY KEY,
+                     error TEXT,
+                     failed_at REAL)''')
+
+def _add_video_access(conn):
+    # When each video was last opened, so maintenance.py can evict the least recently
+    # used transcripts. Existing videos start from their newest message, or creation.
+    conn.execute("ALTER TABLE videos ADD COLUMN last_opened_at REAL")
+    rows = conn.execute("SELECT v.id, COALESCE(MAX(m.timestamp), v.created_at) FROM videos v "
+                        "LEFT JOIN messages m ON m.video_id = v.id GROUP BY v.id").fetchall()
+    conn.executemany("UPDATE videos SET last_opened_at = ? WHERE id = ?",
+                     [(_epoch(ts), video_id) for video_id, ts in rows])
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_videos_last_opened ON videos (last_opened_at, id)")
+
+def _add_token_counts(conn):
+    # Estimated tokens (see tokens.py) of each video's transcript and of each message,
+    # counted once when stored. The video keeps its count when its transcript is evicted.
+    conn.execute("ALTER TABLE videos ADD COLUMN transcript_tokens INTEGER")
+    conn.execute("ALTER TABLE messages ADD COLUMN tokens INTEGER")
+    conn.execute(f"UPDATE videos SET transcript_tokens = (SELECT size / {tokens.CHARS_PER_TOKEN} + 1 "
+                 "FROM transcripts WHERE video_id = videos.id)")
+    conn.execute(f"UPDATE messages SET tokens = LENGTH(content) / {tokens.CHARS_PER_TOKEN} + 1")
+    # Map-reduced notes of long transcripts (summarizer.condense), built once and reused
+    conn.execute('''CREATE TABLE IF NOT EXISTS transcript_notes
+                    (video_id INTEGER PRIMARY KEY,
+                     notes TEXT,
+                     tokens INTEGER,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
+    # Model calls made for each video and the tokens they used
+    conn.execute('''CREATE TABLE IF NOT EXISTS video_usage
+                    (video_id INTEGER PRIMARY KEY,
+                     calls INTEGER,
+                     prompt_tokens INTEGER,
+                     completion_tokens INTEGER,
+                     FOREIGN KEY(video_id) REFERENCES videos(id))''')
 
+MIGRATIONS = [
+    _add_query_indexes,
+    _compress_transcripts,
+    _add_chunk_indexes,
+    _add_response_cache,
+    _add_conversation_summaries,
+    _add_search_index,
+    _add_transcript_segments,
+    _add_jobs,
+    _add_transcript_failures,
+    _add_video_access,
+    _add_token_counts,
+]
+
+def migrate():
+    """
+    Applies any migrations newer than the database's user_version. The version is
+    re-read inside each step's write transaction, so processes starting together
+    (app, API, job workers) never apply the same step twice.
+    """
+    with connection() as conn:
+        if conn.execute("PRAGMA user_version").fetchone()[0] >= len(MIGRATIONS):
+            return
+    while True:
+        with transaction() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version >= len(MIGRATIONS):
+                return
+            MIGRATIONS[version](conn)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+
+# --- Transcripts ---
+
+def _compress(text):
+    return zlib.compress(text.encode("utf-8"), 6) if text is not None else None
+
+def _decompress(data):
+    return zlib.decompress(data).decode("utf-8") if data is not None else None
+
+def _epoch(timestamp):
+    # TIMESTAMP columns hold datetime.now() as stored by sqlite3's default adapter
+    if timestamp is None:
+        return time.time()
+    return datetime.datetime.fromisoformat(str(timestamp)).timestamp()
+
+class _TranscriptCache:
+    """Small LRU of decompressed transcripts, bounded by total characters held."""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self._items = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def get(self, video_id):
+        with self._lock:
+            text = self._items.get(video_id)
+            if text is not None:
+                self._items.move_to_end(video_id)
+            return text
+
+    def put(self, video_id, text):
+        if len(text) > self.max_chars:
+            return
+        with self._lock:
+            old = self._items.pop(video_id, None)
+            if old is not None:
+                self._chars -= len(old)
+            self._items[video_id] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars:
+                _, evicted = self._items.popitem(last=False)
+                self._chars -= len(evicted)
+
+    def discard(self, video_id):
+        with self._lock:
+            old = self._items.pop(video_id, None)
+            if old is not None:
+                self._chars -= len(old)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+            self._chars = 0
+
+transcript_cache = _TranscriptCache(max_chars=32_000_000)
+
+@tracing.traced("db.save_transcript")
+def save_transcript(video_id, transcript):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO transcripts (video_id, data, size) VALUES (?, ?, ?)",
+                     (video_id, _compress(transcript), len(transcript)))
+        # The compressed text can't be indexed from a trigger, so the search index is updated here
+        conn.execute("DELETE FROM search_index WHERE rowid = ?", (-2 * video_id - 1,))
+        conn.execute("INSERT INTO search_index (rowid, transcript) VALUES (?, ?)", (-2 * video_id - 1, transcript))
+        conn.execute("UPDATE videos SET transcript_tokens = ? WHERE id = ?", (tokens.estimate(transcript), video_id))
+    transcript_cache.discard(video_id)
+
+def load_transcript(video_id):
+    """Returns the full transcript text for a video, or None if it has none stored."""
+    with tracing.span("db.load_transcript") as info:
+        text = transcript_cache.get(video_id)
+        if text is not None:
+            return text
+        with connection() as conn:
+            row = conn.execute("SELECT data FROM transcripts WHERE video_id = ?", (video_id,)).fetchone()
+        if row is None or row[0] is None:
+            return None
+        info["bytes"] = len(row[0])
+        text = _decompress(row[0])
+        transcript_cache.put(video_id, text)
+        return text
+
+@tracing.traced("db.save_chunk_index")
+def save_chunk_index(video_id, data):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO chunk_indexes (video_id, data) VALUES (?, ?)", (video_id, data))
+
+@tracing.traced("db.load_chunk_index")
+def load_chunk_index(video_id):
+    with connection() as conn:
+        row = conn.execute("SELECT data FROM chunk_indexes WHERE video_id = ?", (video_id,)).fetchone()
+    return row[0] if row else None
+
+@tracing.traced("db.save_segments")
+def save_segments(video_id, data):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO transcript_segments (video_id, data) VALUES (?, ?)", (video_id, data))
+
+@tracing.traced("db.load_segments")
+def load_segments(video_id):
+    with connection() as conn:
+        row = conn.execute("SELECT data FROM transcript_segments WHERE video_id = ?", (video_id,)).fetchone()
+    return row[0] if row else None
+
+@tracing.traced("db.get_transcript_failure")
+def get_transcript_failure(youtube_id):
+    """Returns (error, failed_at) for the last permanent fetch failure of a YouTube ID, or None."""
+    with connection() as conn:
+        return conn.execute("SELECT error, failed_at FROM transcript_failures WHERE youtube_id = ?",
+                            (youtube_id,)).fetchone()
+
+@tracing.traced("db.record_transcript_failure")
+def record_transcript_failure(youtube_id, error):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO transcript_failures (youtube_id, error, failed_at) VALUES (?, ?, ?)",
+                     (youtube_id, error, time.time()))
+
+@tracing.traced("db.clear_transcript_failure")
+def clear_transcript_failure(youtube_id):
+    with transaction() as conn:
+        conn.execute("DELETE FROM transcript_failures WHERE youtube_id = ?", (youtube_id,))
+
+# --- Videos ---
+
+@tracing.traced("db.save_video")
 def save_video(youtube_id, title, transcript):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    try:
-        c.execute("INSERT INTO videos (youtube_id, title, transcript, created_at) VALUES (?, ?, ?, ?)",
-                  (youtube_id, title, transcript, datetime.datetime.now()))
-        conn.commit()
-        video_id = c.lastrowid
-    except sqlite3.IntegrityError:
+    with transaction() as conn:
+        c = conn.cursor()
+        # OR IGNORE keeps the transaction alive when the video already exists
+        c.execute("INSERT OR IGNORE INTO videos (youtube_id, title, created_at, last_opened_at) VALUES (?, ?, ?, ?)",
+                  (youtube_id, title, datetime.datetime.now(), time.time()))
+        if c.rowcount:
+            video_id = c.lastrowid
+            save_transcript(video_id, transcript)
+            return video_id
         # If already exists, return the existing ID
         c.execute("SELECT id FROM videos WHERE youtube_id = ?", (youtube_id,))
-        video_id = c.fetchone()[0]
-    finally:
-        conn.close()
-    return video_id
+        return c.fetchone()[0]
+
+@tracing.traced("db.set_video_title")
+def set_video_title(video_id, title):
+    with transaction() as conn:
+        conn.execute("UPDATE videos SET title = ? WHERE id = ?", (title, video_id))
 
+@tracing.traced("db.get_video")
 def get_video(youtube_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id, title, transcript FROM videos WHERE youtube_id = ?", (youtube_id,))
-    result = c.fetchone()
-    conn.close()
-    return result
+    """Returns (id, title) for a YouTube ID; the transcript is fetched separately via load_transcript."""
+    with connection() as conn:
+        c = conn.execute("SELECT id, title FROM videos WHERE youtube_id = ?", (youtube_id,))
+        return c.fetchone()
 
+@tracing.traced("db.get_video_by_id")
 def get_video_by_id(pk):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id, youtube_id, title, transcript FROM videos WHERE id = ?", (pk,))
-    result = c.fetchone()
-    conn.close()
-    return result
+    """Returns (id, youtube_id, title); the transcript is fetched separately via load_transcript."""
+    with connection() as conn:
+        c = conn.execute("SELECT id, youtube_id, title FROM videos WHERE id = ?", (pk,))
+        return c.fetchone()
 
+@tracing.traced("db.get_all_videos")
 def get_all_videos():
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT id, youtube_id, title FROM videos ORDER BY created_at DESC")
-    results = c.fetchall()
-    conn.close()
-    return results
+    with connection() as conn:
+        c = conn.execute("SELECT id, youtube_id, title FROM videos ORDER BY created_at DESC, id DESC")
+        return c.fetchall()
 
+@tracing.traced("db.get_videos_page")
+def get_videos_page(limit=50, cursor=None, with_created_at=False):
+    """
+    Returns one page of the library, newest first, as ([(id, youtube_id, title), ...], next_cursor).
+    Pass next_cursor back in to get the following page; it is None on the last page.
+    With `with_created_at`, rows are (id, youtube_id, title, created_at).
+    """
+    with connection() as conn:
+        if cursor is None:
+            c = conn.execute(
+                "SELECT id, youtube_id, title, created_at FROM videos ORDER BY created_at DESC, id DESC LIMIT ?",
+                (limit + 1,))
+        else:
+            c = conn.execute(
+                "SELECT id, youtube_id, title, created_at FROM videos "
+                "WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+                (*cursor, limit + 1))
+        rows = c.fetchall()
+    next_cursor = (rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+    return [row if with_created_at else row[:3] for row in rows[:limit]], next_cursor
+
+@tracing.traced("db.count_videos")
+def count_videos():
+    """Number of videos in the library. Scans an index, so callers should cache it (see get_latest_video_id)."""
+    with connection() as conn:
+        return conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+
+def get_latest_video_id():
+    """The highest video id, or 0; it changes whenever a video is added, so it can key a cached count."""
+    with connection() as conn:
+        return conn.execute("SELECT COALESCE(MAX(id), 0) FROM videos").fetchone()[0]
+
+@tracing.traced("db.get_transcript_tokens")
+def get_transcript_tokens(video_id):
+    """Estimated tokens of a video's transcript, or None if it was never stored."""
+    with connection() as conn:
+        row = conn.execute("SELECT transcript_tokens FROM videos WHERE id = ?", (video_id,)).fetchone()
+    return row[0] if row else None
+
+@tracing.traced("db.get_token_stats")
+def get_token_stats(video_id):
+    """
+    Returns {"transcript_tokens", "messages", "message_tokens", "calls", "prompt_tokens",
+    "completion_tokens"} for a video: the stored estimates and the model usage so far.
+    """
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT v.transcript_tokens, "
+            "(SELECT COUNT(*) FROM messages WHERE video_id = v.id), "
+            "(SELECT COALESCE(SUM(tokens), 0) FROM messages WHERE video_id = v.id), "
+            "COALESCE(u.calls, 0), COALESCE(u.prompt_tokens, 0), COALESCE(u.completion_tokens, 0) "
+            "FROM videos v LEFT JOIN video_usage u ON u.video_id = v.id WHERE v.id = ?", (video_id,)).fetchone()
+    if row is None:
+        return None
+    return dict(zip(("transcript_tokens", "messages", "message_tokens", "calls", "prompt_tokens",
+                     "completion_tokens"), row))
+
+@tracing.traced("db.add_usage")
+def add_usage(video_id, calls, prompt_tokens, completion_tokens):
+    """Adds model calls and the tokens they used to a video's usage totals."""
+    with transaction() as conn:
+        conn.execute("INSERT INTO video_usage (video_id, calls, prompt_tokens, completion_tokens) VALUES (?, ?, ?, ?) "
+                     "ON CONFLICT(video_id) DO UPDATE SET calls = calls + excluded.calls, "
+                     "prompt_tokens = prompt_tokens + excluded.prompt_tokens, "
+                     "completion_tokens = completion_tokens + excluded.completion_tokens",
+                     (video_id, calls, prompt_tokens, completion_tokens))
+
+@tracing.traced("db.load_notes")
+def load_notes(video_id):
+    with connection() as conn:
+        row = conn.execute("SELECT notes FROM transcript_notes WHERE video_id = ?", (video_id,)).fetchone()
+    return row[0] if row else None
+
+@tracing.traced("db.save_notes")
+def save_notes(video_id, notes):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO transcript_notes (video_id, notes, tokens) VALUES (?, ?, ?)",
+                     (video_id, notes, tokens.estimate(notes)))
+
+# --- Messages ---
+
+@tracing.traced("db.add_message")
 def add_message(video_id, role, content):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("INSERT INTO messages (video_id, role, content, timestamp) VALUES (?, ?, ?, ?)",
-              (video_id, role, content, datetime.datetime.now()))
-    conn.commit()
-    conn.close()
+    with transaction() as conn:
+        conn.execute("INSERT INTO messages (video_id, role, content, timestamp, tokens) VALUES (?, ?, ?, ?, ?)",
+                     (video_id, role, content, datetime.datetime.now(), tokens.estimate(content)))
 
+@tracing.traced("db.add_messages")
+def add_messages(video_id, messages):
+    """Inserts several (role, content) pairs for a video in one transaction."""
+    now = datetime.datetime.now()
+    with transaction() as conn:
+        conn.executemany("INSERT INTO messages (video_id, role, content, timestamp, tokens) VALUES (?, ?, ?, ?, ?)",
+                         [(video_id, role, content, now, tokens.estimate(content)) for role, content in messages])
+
+@tracing.traced("db.get_chat_history")
 def get_chat_history(video_id):
-    conn = sqlite3.connect(DB_NAME)
-    c = conn.cursor()
-    c.execute("SELECT role, content FROM messages WHERE video_id = ? ORDER BY timestamp ASC", (video_id,))
-    results = c.fetchall()
-    conn.close()
-    return results
+    with connection() as conn:
+        c = conn.execute("SELECT role, content FROM messages WHERE video_id = ? ORDER BY timestamp ASC, id ASC", (video_id,))
+        return c.fetchall()
+
+@tracing.traced("db.get_chat_page")
+def get_chat_page(video_id, limit=50, cursor=None):
+    """
+    Returns the newest `limit` messages of a chat older than `cursor`, in chronological
+    order, as ([(role, content), ...], next_cursor). next_cursor fetches the page before
+    this one and is None once the start of the conversation is reached.
+    """
+    with connection() as conn:
+        if cursor is None:
+            c = conn.execute(
+                "SELECT id, role, content, timestamp FROM messages WHERE video_id = ? "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (video_id, limit + 1))
+        else:
+            c = conn.execute(
+                "SELECT id, role, content, timestamp FROM messages WHERE video_id = ? AND (timestamp, id) < (?, ?) "
+                "ORDER BY timestamp DESC, id DESC LIMIT ?",
+                (video_id, *cursor, limit + 1))
+        rows = c.fetchall()
+    next_cursor = (rows[limit - 1][3], rows[limit - 1][0]) if len(rows) > limit else None
+    return [(role, content) for _, role, content, _ in reversed(rows[:limit])], next_cursor
+
+@tracing.traced("db.get_messages")
+def get_messages(video_id, after_id=0):
+    """Returns (id, role, content) for a chat's messages with id > after_id, oldest first."""
+    with connection() as conn:
+        c = conn.execute(
+            "SELECT id, role, content FROM messages WHERE video_id = ? AND id > ? ORDER BY timestamp ASC, id ASC",
+            (video_id, after_id))
+        return c.fetchall()
+
+@tracing.traced("db.get_video_summary")
+def get_video_summary(video_id):
+    """Returns the first AI message of a chat (the initial video summary), or None."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT content FROM messages WHERE video_id = ? AND role = 'ai' ORDER BY timestamp ASC, id ASC LIMIT 1",
+            (video_id,)).fetchone()
+    return row[0] if row else None
+
+@tracing.traced("db.get_conversation_summary")
+def get_conversation_summary(video_id):
+    """Returns (summary, covered_message_id) for a chat, or (None, 0) if nothing is summarized yet."""
+    with connection() as conn:
+        row = conn.execute(
+            "SELECT summary, covered_message_id FROM conversation_summaries WHERE video_id = ?", (video_id,)).fetchone()
+    return row if row else (None, 0)
+
+@tracing.traced("db.save_conversation_summary")
+def save_conversation_summary(video_id, summary, covered_message_id):
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO conversation_summaries (video_id, summary, covered_message_id) "
+                     "VALUES (?, ?, ?)", (video_id, summary, covered_message_id))
+
+# --- Response Cache ---
+
+@tracing.traced("db.get_cached_response")
+def get_cached_response(key, min_created_at):
+    """Returns the cached response for `key` if it was stored after `min_created_at`, and marks it used."""
+    with connection() as conn:
+        row = conn.execute("SELECT response FROM response_cache WHERE key = ? AND created_at >= ?",
+                           (key, min_created_at)).fetchone()
+        if row is None:
+            return None
+        with transaction():
+            conn.execute("UPDATE response_cache SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+@tracing.traced("db.put_cached_response")
+def put_cached_response(key, youtube_id, model, response):
+    now = time.time()
+    with transaction() as conn:
+        conn.execute("INSERT OR REPLACE INTO response_cache (key, youtube_id, model, response, size, created_at, last_used) "
+                     "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                     (key, youtube_id, model, response, len(response), now, now))
+
+@tracing.traced("db.evict_cached_responses")
+def evict_cached_responses(min_created_at, max_bytes):
+    """Drops expired entries, then least-recently-used ones until the cache holds at most max_bytes."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM response_cache WHERE created_at < ?", (min_created_at,))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM response_cache").fetchone()[0]
+        if total <= max_bytes:
+            return
+        excess = total - max_bytes
+        keys = []
+        for key, size in conn.execute("SELECT key, size FROM response_cache ORDER BY last_used ASC"):
+            keys.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM response_cache WHERE key = ?", keys)
+
+# --- Search ---
+
+# Relative weight of a match in each search_index column
+SEARCH_WEIGHTS = {"title": 10.0, "transcript": 1.0, "message": 2.0}
+SNIPPET_WORDS = 24
+
+_WORD_RE = re.compile(r"\w+")
+
+def _match_query(text):
+    """
+    Turns free text into an FTS5 query in which every word must appear. Words are
+    quoted so user input can't form FTS5 syntax. No prefix matching: a short
+    prefix expands to hundreds of terms and makes a query over a large library slow.
+    """
+    words = _WORD_RE.findall(text.lower())
+    return " ".join(f'"{w}"' for w in words) if words else None
+
+def _snippet(text, words, size=SNIPPET_WORDS):
+    """The `size`-word window of `text` around the first query match, with matches in bold."""
+    pattern = re.compile(r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b", re.IGNORECASE)
+    first = pattern.search(text)
+    head = text[:first.start()].split() if first else []
+    tail = text[first.start():].split() if first else text.split()
+    before = head[len(head) - min(len(head), size // 3):]
+    after = tail[:size - len(before)]
+    snippet = pattern.sub(lambda m: f"**{m.group(0)}**", " ".join(before + after))
+    prefix = "…" if len(head) > len(before) else ""
+    suffix = "…" if len(tail) > len(after) else ""
+    return prefix + snippet + suffix
+
+@tracing.traced("db.search")
+def search(query, limit=20):
+    """
+    Ranked full-text search over titles, transcripts and chat messages.
+    Returns the best match per video, best first, as
+    [(video_id, youtube_id, title, kind, snippet), ...] where kind is
+    "title", "transcript" or "message".
+    """
+    match = _match_query(query)
+    if match is None:
+        return []
+    with connection() as conn:
+        weights = ", ".join(str(w) for w in SEARCH_WEIGHTS.values())
+        # A video can match in many rows; over-fetch so `limit` distinct videos survive
+        hits = conn.execute(f"SELECT rowid FROM search_index WHERE search_index MATCH ? "
+                            f"ORDER BY bm25(search_index, {weights}) LIMIT ?", (match, limit * 5)).fetchall()
+
+        words = _WORD_RE.findall(query.lower())
+        results, seen = [], set()
+        for (rowid,) in hits:
+            if rowid > 0:
+                row = conn.execute("SELECT video_id, content FROM messages WHERE id = ?", (rowid,)).fetchone()
+                if row is None:
+                    continue
+                video_id, kind, text = row[0], "message", row[1]
+            else:
+                video_id, kind, text = -rowid // 2, "title" if rowid % 2 == 0 else "transcript", None
+            if video_id in seen:
+                continue
+            video = get_video_by_id(video_id)
+            if video is None:
+                continue
+            if kind == "title":
+                text = video[2] or ""
+            elif kind == "transcript":
+                text = load_transcript(video_id) or ""
+            seen.add(video_id)
+            results.append((video_id, video[1], video[2], kind, _snippet(text, words)))
+            if len(results) == limit:
+                break
+        return results
+
+# --- Jobs ---
+
+@tracing.traced("db.enqueue_job")
+def enqueue_job(kind, payload, dedupe_key=None, max_attempts=5):
+    """
+    Queues a job and returns its id. If `dedupe_key` matches a job that is still
+    queued or running, that job's id is returned instead.
+    """
+    now = time.time()
+    with transaction() as conn:
+        if dedupe_key is not None:
+            row = conn.execute("SELECT id FROM jobs WHERE dedupe_key = ? AND state IN ('queued', 'running') "
+                               "ORDER BY id DESC LIMIT 1", (dedupe_key,)).fetchone()
+            if row:
+                return row[0]
+        c = conn.execute("INSERT INTO jobs (kind, payload, dedupe_key, state, attempts, max_attempts, run_after, "
+                         "created_at, updated_at) VALUES (?, ?, ?, 'queued', 0, ?, ?, ?, ?)",
+                         (kind, payload, dedupe_key, max_attempts, now, now, now))
+        return c.lastrowid
+
+@tracing.traced("db.claim_job")
+def claim_job(owner, lease_seconds):
+    """
+    Leases the next runnable job to `owner`: the oldest queued job that is due, or
+    else a running one whose lease has expired (its worker died). Returns
+    (id, kind, payload, attempt) or None. Jobs that expire on their last attempt fail.
+    """
+    now = time.time()
+    with transaction() as conn:
+        conn.execute("UPDATE jobs SET state = 'failed', error = 'lease expired', lease_owner = NULL, updated_at = ? "
+                     "WHERE state = 'running' AND lease_expires < ? AND attempts >= max_attempts", (now, now))
+        row = conn.execute("SELECT id, kind, payload, attempts FROM jobs WHERE state = 'queued' AND run_after <= ? "
+                           "ORDER BY run_after, id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            row = conn.execute("SELECT id, kind, payload, attempts FROM jobs WHERE state = 'running' "
+                               "AND lease_expires < ? ORDER BY id LIMIT 1", (now,)).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE jobs SET state = 'running', lease_owner = ?, lease_expires = ?, attempts = attempts + 1, "
+                     "updated_at = ? WHERE id = ?", (owner, now + lease_seconds, now, row[0]))
+        return row[0], row[1], row[2], row[3] + 1
+
+@tracing.traced("db.renew_job_lease")
+def renew_job_lease(job_id, owner, lease_seconds):
+    """Extends a running job's lease. False if `owner` no longer holds it."""
+    now = time.time()
+    with transaction() as conn:
+        c = conn.execute("UPDATE jobs SET lease_expires = ?, updated_at = ? "
+                         "WHERE id = ? AND state = 'running' AND lease_owner = ?",
+                         (now + lease_seconds, now, job_id, owner))
+        return c.rowcount == 1
+
+@tracing.traced("db.complete_job")
+def complete_job(job_id, owner, result):
+    """Marks a job done with its result. False (and no change) if `owner` lost the lease."""
+    with transaction() as conn:
+        c = conn.execute("UPDATE jobs SET state = 'done', result = ?, error = NULL, lease_owner = NULL, updated_at = ? "
+                         "WHERE id = ? AND state = 'running' AND lease_owner = ?",
+                         (result, time.time(), job_id, owner))
+        return c.rowcount == 1
+
+@tracing.traced("db.retry_job")
+def retry_job(job_id, owner, error, run_after=None):
+    """
+    Records a failed attempt. The job is queued again from `run_after` unless it
+    has used all its attempts or `run_after` is None, in which case it fails.
+    """
+    with transaction() as conn:
+        c = conn.execute("UPDATE jobs SET state = CASE WHEN ? IS NULL OR attempts >= max_attempts "
+                         "THEN 'failed' ELSE 'queued' END, run_after = COALESCE(?, run_after), error = ?, "
+                         "lease_owner = NULL, updated_at = ? WHERE id = ? AND state = 'running' AND lease_owner = ?",
+                         (run_after, run_after, error, time.time(), job_id, owner))
+        return c.rowcount == 1
+
+@tracing.traced("db.get_job")
+def get_job(job_id):
+    """Returns (state, kind, result, error, attempts) for a job, or None."""
+    with connection() as conn:
+        return conn.execute("SELECT state, kind, result, error, attempts FROM jobs WHERE id = ?",
+                            (job_id,)).fetchone()
+
+@tracing.traced("db.prune_jobs")
+def prune_jobs(before):
+    """Deletes finished (done or failed) jobs last updated before `before`."""
+    with transaction() as conn:
+        conn.execute("DELETE FROM jobs WHERE state IN ('done', 'failed') AND updated_at < ?", (before,))
+
+# --- Maintenance (see maintenance.py) ---
+
+# When this process last recorded each video as opened; later opens within
+# TOUCH_INTERVAL seconds skip the write
+TOUCH_INTERVAL = 3600
+_touched = {}
+
+def touch_video(video_id):
+    """Records that a video was opened, for least-recently-used transcript eviction."""
+    now = time.time()
+    if now - _touched.get(video_id, 0) < TOUCH_INTERVAL:
+        return
+    _touched[video_id] = now
+    with transaction() as conn:
+        conn.execute("UPDATE videos SET last_opened_at = ? WHERE id = ?", (now, video_id))
+
+@tracing.traced("db.get_stored_transcripts")
+def get_stored_transcripts():
+    """
+    Returns (video id, last_opened_at, bytes) for every video whose transcript is
+    stored, least recently opened first. `bytes` covers the compressed transcript,
+    its chunk index and its segments.
+    """
+    with connection() as conn:
+        return conn.execute(
+            "SELECT v.id, v.last_opened_at, LENGTH(t.data)"
+            " + COALESCE((SELECT LENGTH(data) FROM chunk_indexes WHERE video_id = v.id), 0)"
+            " + COALESCE((SELECT LENGTH(data) FROM transcript_segments WHERE video_id = v.id), 0) "
+            "FROM videos v JOIN transcripts t ON t.video_id = v.id WHERE t.data IS NOT NULL "
+            "ORDER BY v.last_opened_at ASC, v.id ASC").fetchall()
+
+@tracing.traced("db.evict_transcripts")
+def evict_transcripts(video_ids):
+    """Deletes the transcripts, chunk indexes and segments of these videos; the videos and chats stay."""
+    with transaction() as conn:
+        for table in ("transcripts", "chunk_indexes", "transcript_segments"):
+            conn.executemany(f"DELETE FROM {table} WHERE video_id = ?", [(v,) for v in video_ids])
+    for video_id in video_ids:
+        transcript_cache.discard(video_id)
+
+@tracing.traced("db.get_idle_chats")
+def get_idle_chats(before):
+    """
+    Returns (video id, youtube_id, title) for chats whose newest message is older than
+    `before` (a datetime) and that have more than the initial summary exchange.
+    """
+    with connection() as conn:
+        return conn.execute(
+            "SELECT v.id, v.youtube_id, v.title FROM videos v JOIN messages m ON m.video_id = v.id "
+            "GROUP BY v.id HAVING MAX(m.timestamp) < ? AND COUNT(*) > 2 ORDER BY v.id",
+            (before,)).fetchall()
+
+@tracing.traced("db.get_messages_after_summary")
+def get_messages_after_summary(video_id):
+    """Returns (id, role, content, timestamp) for a chat's messages after its initial summary, oldest first."""
+    with connection() as conn:
+        return conn.execute(
+            "SELECT id, role, content, timestamp FROM messages WHERE video_id = ? AND id > "
+            "(SELECT COALESCE(MIN(id), 0) FROM messages WHERE video_id = ? AND role = 'ai') "
+            "ORDER BY timestamp ASC, id ASC", (video_id, video_id)).fetchall()
+
+@tracing.traced("db.delete_messages")
+def delete_messages(message_ids):
+    with transaction() as conn:
+        conn.executemany("DELETE FROM messages WHERE id = ?", [(m,) for m in message_ids])
+
+@tracing.traced("db.restore_messages")
+def restore_messages(video_id, messages):
+    """Re-inserts archived (id, role, content, timestamp) messages under their original ids."""
+    with transaction() as conn:
+        c = conn.executemany("INSERT OR IGNORE INTO messages (id, video_id, role, content, timestamp, tokens) "
+                             "VALUES (?, ?, ?, ?, ?, ?)",
+                             [(m[0], video_id, *m[1:], tokens.estimate(m[2])) for m in messages])
+        return c.rowcount
+
+def page_stats():
+    """Returns (page_size, page_count, freelist_count, auto_vacuum) for the database file."""
+    with connection() as conn:
+        return tuple(conn.execute(f"PRAGMA {name}").fetchone()[0]
+                     for name in ("page_size", "page_count", "freelist_count", "auto_vacuum"))
+
+def vacuum(incremental=True):
+    """
+    Returns free pages to the filesystem and returns how many were freed. A full
+    VACUUM rewrites the file, and is also how an older database switches to
+    incremental auto-vacuum. Must not run inside a transaction.
+    """
+    with connection() as conn:
+        before = conn.execute("PRAGMA freelist_count").fetchone()[0]
+        if incremental:
+            conn.execute("PRAGMA incremental_vacuum").fetchall()
+        else:
+            conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+            conn.execute("VACUUM")
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return before - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+# --- Export / Import (see transfer.py) ---
+
+@contextmanager
+def snapshot():
+    """
+    Runs the enclosed reads against one consistent view of the database. It is a
+    read transaction, so writers (in WAL mode) are not blocked while it is open.
+    """
+    with connection() as conn:
+        conn.execute("BEGIN DEFERRED")
+        try:
+            yield conn
+        finally:
+            conn.execute("COMMIT")
+
+def iter_export_videos():
+    """
+    Yields (id, youtube_id, title, created_at, last_opened_at, transcript, segments, chunk_index)
+    for every video, oldest first, one row at a time. `transcript` is the text; the
+    other two are the stored blobs. Any of the three is None if not stored.
+    """
+    with connection() as conn:
+        rows = conn.execute(
+            "SELECT v.id, v.youtube_id, v.title, v.created_at, v.last_opened_at, t.data, s.data, ci.data "
+            "FROM videos v LEFT JOIN transcripts t ON t.video_id = v.id "
+            "LEFT JOIN transcript_segments s ON s.video_id = v.id LEFT JOIN chunk_indexes ci ON ci.video_id = v.id "
+            "ORDER BY v.id")
+        for row in rows:
+            yield (*row[:5], _decompress(row[5]), *row[6:])
+
+def iter_export_messages(video_id):
+    """Yields (role, content, timestamp) for a chat's messages, oldest first, one row at a time."""
+    with connection() as conn:
+        yield from conn.execute(
+            "SELECT role, content, timestamp FROM messages WHERE video_id = ? ORDER BY timestamp ASC, id ASC",
+            (video_id,))
+
+def upsert_video(youtube_id, title, created_at, last_opened_at, replace_title=True):
+    """
+    Inserts a video, or merges it into the one stored under the same YouTube ID:
+    the title is replaced if `replace_title`, and the earliest creation and latest
+    open times are kept. Returns (id, whether it was inserted).
+    """
+    with transaction() as conn:
+        row = conn.execute("SELECT id FROM videos WHERE youtube_id = ?", (youtube_id,)).fetchone()
+        if row is None:
+            c = conn.execute("INSERT INTO videos (youtube_id, title, created_at, last_opened_at) VALUES (?, ?, ?, ?)",
+                             (youtube_id, title, created_at, last_opened_at))
+            return c.lastrowid, True
+        if replace_title:
+            # Only touching changed titles keeps the search index trigger from firing needlessly
+            conn.execute("UPDATE videos SET title = ? WHERE id = ? AND title IS NOT ?", (title, row[0], title))
+        conn.execute("UPDATE videos SET created_at = MIN(COALESCE(created_at, ?), ?), "
+                     "last_opened_at = MAX(COALESCE(last_opened_at, 0), COALESCE(?, 0)) WHERE id = ?",
+                     (created_at, created_at, last_opened_at, row[0]))
+        return row[0], False
+
+def has_transcript(video_id):
+    with connection() as conn:
+        return conn.execute("SELECT 1 FROM transcripts WHERE video_id = ? AND data IS NOT NULL",
+                            (video_id,)).fetchone() is not None
+
+def message_key(role, content, timestamp):
+    # A digest rather than the text, so a long chat's keys stay small
+    return role, hashlib.blake2b(content.encode("utf-8"), digest_size=16).digest(), str(timestamp)
+
+def get_message_keys(video_id):
+    """Returns the `message_key` of every message in a chat, to skip messages it already has."""
+    with connection() as conn:
+        rows = conn.execute("SELECT role, content, timestamp FROM messages WHERE video_id = ?", (video_id,))
+        return {message_key(*row) for row in rows}
+
+def insert_messages(video_id, messages):
+    """Inserts (role, content, timestamp) rows for a video, keeping their timestamps."""
+    with transaction() as conn:
+        conn.executemany("INSERT INTO messages (video_id, role, content, timestamp, tokens) VALUES (?, ?, ?, ?, ?)",
+                         [(video_id, *m, tokens.estimate(m[1])) for m in messages])
@@ -0,0 +1,148 @@
+"""
+Bulk, non-interactive ingestion of YouTube videos into the library.
+
+Reads video URLs, IDs or playlist URLs (one per line, `#` comments allowed)
+from a file or stdin, fetches transcripts and titles with bounded concurrency
+and per-host rate limiting, and stores them with `database.save_video`.
+Videos already in the library are skipped, so re-running the same input after
+a crash resumes where it stopped.
+
+    uv run ingest.py urls.txt --workers 8 --rate 4
+    cat urls.txt | uv run ingest.py - --summarize
+"""
+import argparse
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import database
+import titles
+from main import console, extract_video_id, generate_summary, get_model, ingest_video, record_usage, SUMMARY_REQUEST
+
+YOUTUBE_HOST = "www.youtube.com"
+PLAYLIST_VIDEO_RE = re.compile(r'"videoId":"([\w-]{11})"')
+
+
+class RateLimiter:
+    """Spaces out requests to each host so all workers together stay under `per_second`."""
+
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0.0
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next.get(host, now))
+            self._next[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_inputs(path):
+    stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+    with stream:
+        for line in stream:
+            line = line.split("#", 1)[0].strip()
+            if line:
+                yield line
+
+
+def expand_playlist(url, limiter):
+    """
+    Returns the video IDs listed on a playlist page, in order.
+    Only the entries in the initial page HTML are found (about the first 100).
+    """
+    limiter.wait(YOUTUBE_HOST)
+    r = titles.session.get(url, timeout=titles.TIMEOUT)
+    r.raise_for_status()
+    return list(dict.fromkeys(PLAYLIST_VIDEO_RE.findall(r.text)))
+
+
+def ingest_one(video_id, limiter, llm, llm_slots):
+    """Fetches and stores one video (and its summary if `llm` is set). Returns a status string."""
+    existing = database.get_video(video_id)
+    if existing is None:
+        # One slot for the transcript and one for the title, which are fetched together
+        limiter.wait(YOUTUBE_HOST)
+        limiter.wait(YOUTUBE_HOST)
+        db_id, _ = ingest_video(f"https://{YOUTUBE_HOST}/watch?v={video_id}")
+        if db_id is None:
+            return "failed"
+        status = "ingested"
+    else:
+        db_id = existing[0]
+        status = "skipped"
+
+    # A crash between saving the video and its summary is picked up here on the next run
+    if llm is not None and not database.get_chat_page(db_id, limit=1)[0]:
+        usage = {}
+        with llm_slots:
+            summary = generate_summary(llm, db_id, usage)
+        with database.transaction():
+            database.add_messages(db_id, [("user", SUMMARY_REQUEST), ("ai", summary)])
+            record_usage(db_id, usage)
+        status = "summarized" if status == "skipped" else status
+
+    return status
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="file with one URL/ID/playlist per line, or - for stdin")
+    parser.add_argument("--workers", type=int, default=8, help="concurrent fetches")
+    parser.add_argument("--rate", type=float, default=4.0, help="max requests per second to YouTube (0 = unlimited)")
+    parser.add_argument("--summarize", action="store_true", help="also generate and store the initial summary")
+    parser.add_argument("--summary-workers", type=int, default=4, help="concurrent LLM calls when summarizing")
+    args = parser.parse_args()
+
+    llm = None
+    if args.summarize:
+        llm = get_model()
+        if llm is None:
+            console.print("[bold red]Error:[/bold red] --summarize needs GOOGLE_API_KEY.")
+            return 1
+
+    database.init_db()
+    limiter = RateLimiter(args.rate)
+
+    video_ids = []
+    for line in read_inputs(args.input):
+        if "list=" in line and "v=" not in line:
+            try:
+                video_ids.extend(expand_playlist(line, limiter))
+            except Exception as e:
+                console.print(f"[bold red]Error expanding playlist[/bold red] {line}: {e}")
+        else:
+            video_ids.append(extract_video_id(line))
+    video_ids = list(dict.fromkeys(video_ids))
+
+    counts = {}
+    llm_slots = threading.Semaphore(args.summary_workers)
+    start = last_report = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        futures = {pool.submit(ingest_one, vid, limiter, llm, llm_slots): vid for vid in video_ids}
+        for done, future in enumerate(as_completed(futures), start=1):
+            try:
+                status = future.result()
+            except Exception as e:
+                console.print(f"[bold red]Error ingesting[/bold red] {futures[future]}: {e}")
+                status = "failed"
+            counts[status] = counts.get(status, 0) + 1
+            now = time.perf_counter()
+            if now - last_report >= 10 or done == len(futures):
+                last_report = now
+                summary = "  ".join(f"{k} {v}" for k, v in sorted(counts.items()))
+                console.print(f"[{done}/{len(futures)}] {done / (now - start):.2f} videos/s  {summary}")
+
+    elapsed = time.perf_counter() - start
+    console.print(f"[bold green]Done:[/bold green] {len(video_ids)} videos in {elapsed:.1f}s "
+                  f"({len(video_ids) / elapsed if elapsed else 0:.2f} videos/s)")
+    return 1 if counts.get("failed") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,237 @@
+"""
+Durable background jobs for ingestion and summarization.
+
+Jobs live in the `jobs` table of the app's SQLite database, so any number of
+app instances can enqueue work and any number of workers can run it. A worker
+leases one job at a time and renews the lease while the job runs; if the worker
+dies, the lease expires and another worker picks the job up again. Failed
+attempts are retried with exponential backoff until MAX_ATTEMPTS.
+
+Job kinds:
+  ingest   {"url"}       fetch transcript and title, store the video, queue its summary
+  title    {"video_id"}  retry the title lookup for a video stored as "Unknown Video"
+  summary  {"video_id"}  generate and store the initial summary
+
+    uv run jobs.py --processes 2 --threads 4
+    uv run jobs.py --once        # run until the queue is empty, then exit
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import socket
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import database
+import titles
+import transcripts
+from main import (console, extract_video_id, generate_summary, get_model, ingest_video, record_usage,
+                  SUMMARY_REQUEST, UNKNOWN_TITLE)
+
+# A running job's lease; the worker renews it every LEASE_SECONDS / 3
+LEASE_SECONDS = 60
+MAX_ATTEMPTS = 5
+# Retry delay: BACKOFF_BASE * 2^(attempt - 1) seconds, capped, with +-50% jitter
+BACKOFF_BASE = 5.0
+BACKOFF_MAX = 600.0
+# How long an idle worker waits before looking for work again
+POLL_SECONDS = 1.0
+# Finished jobs are kept this long (so pollers can read their result), then pruned
+KEEP_FINISHED_SECONDS = 24 * 3600
+
+HANDLERS = {}
+
+
+class PermanentError(Exception):
+    """Raised by a handler when retrying cannot help; the job fails at once."""
+
+
+def handler(kind):
+    def register(fn):
+        HANDLERS[kind] = fn
+        return fn
+    return register
+
+
+def enqueue(kind, payload, dedupe_key=None):
+    """Queues a job (or finds the queued or running one with the same `dedupe_key`) and returns its id."""
+    return database.enqueue_job(kind, json.dumps(payload), dedupe_key, MAX_ATTEMPTS)
+
+
+def enqueue_ingest(url):
+    return enqueue("ingest", {"url": url}, f"ingest:{extract_video_id(url)}")
+
+
+def enqueue_summary(video_id):
+    return enqueue("summary", {"video_id": video_id}, f"summary:{video_id}")
+
+
+def status(job_id):
+    """Returns {"state", "kind", "result", "error", "attempts"} for a job, or None."""
+    row = database.get_job(job_id)
+    if row is None:
+        return None
+    state, kind, result, error, attempts = row
+    return {"state": state, "kind": kind, "result": json.loads(result) if result else None,
+            "error": error, "attempts": attempts}
+
+
+def backoff(attempt):
+    delay = min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+# --- Handlers ---
+
+@handler("ingest")
+def run_ingest(payload, llm):
+    url = payload["url"]
+    youtube_id = extract_video_id(url)
+    existing = database.get_video(youtube_id)
+    if existing is not None:
+        video_id = existing[0]
+    else:
+        video_id, _ = ingest_video(url)
+        if video_id is None:
+            # A remembered permanent failure (no captions, private video) won't go away by retrying
+            failure = database.get_transcript_failure(youtube_id)
+            if failure is not None:
+                raise PermanentError(failure[0])
+            raise RuntimeError("could not fetch the transcript")
+    if database.get_video_by_id(video_id)[2] == UNKNOWN_TITLE:
+        enqueue("title", {"video_id": video_id}, f"title:{video_id}")
+    enqueue_summary(video_id)
+    return {"video_id": video_id}
+
+
+@handler("title")
+def run_title(payload, llm):
+    video_id = payload["video_id"]
+    video = database.get_video_by_id(video_id)
+    if video is None:
+        raise PermanentError("video no longer exists")
+    if video[2] != UNKNOWN_TITLE:
+        return {"title": video[2]}
+    title = titles.get_title(video[1])
+    if not title:
+        raise RuntimeError("title lookup failed")
+    database.set_video_title(video_id, title)
+    return {"title": title}
+
+
+@handler("summary")
+def run_summary(payload, llm):
+    video_id = payload["video_id"]
+    if database.get_chat_page(video_id, limit=1)[0]:
+        return {"skipped": True}
+    if llm is None:
+        raise PermanentError("GOOGLE_API_KEY is not set for the worker")
+    try:
+        transcript = transcripts.load(video_id)
+    except transcripts.TranscriptUnavailable as e:
+        raise PermanentError(str(e))
+    if transcript is None:
+        raise PermanentError("video has no transcript")
+    usage = {}
+    summary = generate_summary(llm, video_id, usage)
+    with database.transaction():
+        # The page may have produced a summary itself while this one was generated
+        if not database.get_chat_page(video_id, limit=1)[0]:
+            database.add_messages(video_id, [("user", SUMMARY_REQUEST), ("ai", summary)])
+        record_usage(video_id, usage)
+    return {"video_id": video_id}
+
+
+# --- Worker ---
+
+def _heartbeat(job_id, owner, done):
+    while not done.wait(LEASE_SECONDS / 3):
+        if not database.renew_job_lease(job_id, owner, LEASE_SECONDS):
+            return
+
+
+def run_next(owner, llm):
+    """Claims and runs one job. Returns False if there was nothing to do."""
+    job = database.claim_job(owner, LEASE_SECONDS)
+    if job is None:
+        return False
+    job_id, kind, payload, attempt = job
+    done = threading.Event()
+    threading.Thread(target=_heartbeat, args=(job_id, owner, done), daemon=True).start()
+    try:
+        fn = HANDLERS.get(kind)
+        if fn is None:
+            raise PermanentError(f"unknown job kind {kind!r}")
+        result = fn(json.loads(payload), llm)
+    except PermanentError as e:
+        database.retry_job(job_id, owner, str(e))
+        console.print(f"[bold red]Job {job_id} ({kind}) failed:[/bold red] {e}")
+    except Exception as e:
+        database.retry_job(job_id, owner, f"{type(e).__name__}: {e}", time.time() + backoff(attempt))
+        console.print(f"[yellow]Job {job_id} ({kind}) attempt {attempt} failed:[/yellow] {e}")
+    else:
+        database.complete_job(job_id, owner, json.dumps(result))
+    finally:
+        done.set()
+    return True
+
+
+def work(owner, llm, stop, once=False):
+    """Runs jobs until `stop` is set (or, with `once`, until none are runnable)."""
+    last_prune = 0.0
+    while not stop.is_set():
+        if time.time() - last_prune > 3600:
+            database.prune_jobs(time.time() - KEEP_FINISHED_SECONDS)
+            last_prune = time.time()
+        if not run_next(owner, llm):
+            if once:
+                return
+            stop.wait(POLL_SECONDS)
+
+
+def run_process(threads, once):
+    """One worker process: `threads` workers sharing one LLM client."""
+    database.init_db()
+    llm = get_model()
+    stop = threading.Event()
+    prefix = f"{socket.gethostname()}:{os.getpid()}"
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(work, f"{prefix}:{n}", llm, stop, once) for n in range(threads)]
+        try:
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            stop.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--threads", type=int, default=4, help="concurrent jobs per process")
+    parser.add_argument("--once", action="store_true", help="exit once the queue is empty")
+    args = parser.parse_args()
+
+    if args.processes == 1:
+        run_process(args.threads, args.once)
+        return 0
+    # spawn, not fork: the parent has already imported the gRPC-based Gemini client
+    context = multiprocessing.get_context("spawn")
+    processes = [context.Process(target=run_process, args=(args.threads, args.once))
+                 for _ in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.join()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Deferred imports for heavy dependencies.
+
+numpy, LangChain, the Gemini client and rich together take well over a second
+to import, and many entry points (listing the library, the job and API
+servers before their first model call, `ingest.py` without `--summarize`)
+never need some of them. Modules that use a heavy dependency throughout bind
+it with `lazy_import`; code that needs one in a single place imports it inside
+the function instead, and module-level singletons are wrapped in `LazyObject`.
+"""
+import importlib.util
+import sys
+import threading
+
+_lock = threading.Lock()
+
+
+def lazy_import(name):
+    """
+    Returns module `name` without running it; it is imported for real the first
+    time one of its attributes is used. Already imported modules are returned as is.
+    """
+    with _lock:
+        module = sys.modules.get(name)
+        if module is not None:
+            return module
+        spec = importlib.util.find_spec(name)
+        if spec is None:
+            raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+        loader = importlib.util.LazyLoader(spec.loader)
+        spec.loader = loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        loader.exec_module(module)
+        return module
+
+
+class LazyObject:
+    """
+    Stands in for the object `factory()` returns, calling it (once, thread-safely)
+    the first time an attribute is used. For module-level singletons such as a
+    console or an HTTP session whose construction imports a heavy library.
+    """
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, name):
+        if self._target is None:
+            with self._lock:
+                if self._target is None:
+                    self._target = self._factory()
+        return getattr(self._target, name)
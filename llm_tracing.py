@@ -0,0 +1,42 @@
+"""
+The LangChain callback that times model calls. Kept out of `main` so
+langchain_core loads only when a model is created.
+"""
+import time
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+import tracing
+
+
+class LLMTracer(BaseCallbackHandler):
+    """
+    Records every model call (invoke, stream or batch) as an `llm` tracing
+    stage, with prompt + completion tokens when the model reports usage.
+    """
+
+    def __init__(self):
+        self._starts = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is None:
+            return
+        tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+                if usage:
+                    tokens += usage.get("total_tokens", 0)
+        tracing.record("llm", time.perf_counter() - start, tokens=tokens or None)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            tracing.record("llm.error", time.perf_counter() - start)
+
+
+llm_tracer = LLMTracer()
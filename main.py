@@ -1,56 +1,347 @@
 import os
+import sys
+import time
+import argparse
 import getpass
+import warnings
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-from youtube_transcript_api import YouTubeTranscriptApi
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage
-from rich.console import Console
-from rich.markdown import Markdown
-from rich.panel import Panel
-from rich.prompt import Prompt
+
+import conversation
+import database
+import response_cache
+import retrieval
+import segments
+import summarizer
+import titles
+import tokens
+import tracing
+import transcripts
+from lazy import LazyObject
 
 # Load environment variables from .env file
 load_dotenv()
 
 # Set model
 MODEL_NAME = "gemini-2.5-flash" # Verified available via API
+TEMPERATURE = 0.7
+
+# How much of the video goes into each prompt:
+#   "auto"      - chosen per video from its transcript's stored token count (below)
+#   "full"      - the whole transcript, every turn
+#   "compact"   - map-reduced notes on the whole video plus the top-k transcript chunks for the question
+#   "retrieval" - a short overview plus the top-k transcript chunks for the question
+CONTEXT_MODE = os.environ.get("CONTEXT_MODE", "auto")
+if CONTEXT_MODE not in ("auto", "full", "compact", "retrieval"):
+    warnings.warn(f"Unknown CONTEXT_MODE {CONTEXT_MODE!r}; using 'auto'")
+    CONTEXT_MODE = "auto"
+RETRIEVAL_TOP_K = 5
+# "auto" sends transcripts up to FULL_CONTEXT_TOKENS whole, up to COMPACT_CONTEXT_TOKENS
+# compacted, and longer ones chunked
+FULL_CONTEXT_TOKENS = summarizer.LONG_TRANSCRIPT_TOKENS
+COMPACT_CONTEXT_TOKENS = 150_000
+# Largest prompt sent to the model (Gemini 2.5 Flash takes about 1M input tokens);
+# a transcript too long for "full" is compacted instead
+MAX_PROMPT_TOKENS = 900_000
+
+# Web app: answer the suggested follow-up questions in the background while
+# the user reads, so clicking one shows its answer at once (costs extra tokens)
+SPECULATIVE = os.environ.get("SPECULATIVE", "0") == "1"
+
+# Web app: hand ingestion and first summaries to the background workers in
+# jobs.py (run `uv run jobs.py`) instead of doing them in the page's thread
+JOB_QUEUE = os.environ.get("JOB_QUEUE", "0") == "1"
+
+# Network fetches for new videos (title lookups, map-reduce prep) run here,
+# alongside the transcript fetch on the calling thread
+FETCH_WORKERS = 8
+fetch_pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="fetch")
+
+SYSTEM_PROMPT = """
+You are a helpful assistant.
+Your goal is to answer questions based on the video content provided below.
+CRITICAL INSTRUCTION: Do NOT mention "the transcript", "the text", or "according to the video" in your responses. 
+Act as if you just watched the video and know the information naturally.
+After answering the user's question, you MUST provide 3 short "Next Question" suggestions relevant to the context.
+Format the suggestions clearly at the end of your response like this:
+
+**Suggested Questions:**
+1. ...
+2. ...
+3. ...
+
+Context Data:
+{transcript}
+"""
+
+SUMMARY_REQUEST = "Please provide a short summary paragraph of the video content."
 
-console = Console()
+def _make_console():
+    from rich import get_console
+    return get_console()
 
-def get_model():
+# rich's shared console (so Live and Prompt use it too), created on first use:
+# rich alone takes longer to import than the rest of this module
+console = LazyObject(_make_console)
+
+def get_model(model_name=MODEL_NAME, temperature=TEMPERATURE):
     """Returns the configured ChatGoogleGenerativeAI instance."""
     api_key = os.environ.get("GOOGLE_API_KEY")
     if not api_key:
         return None
-    return ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=0.7)
+    # The Gemini client is most of this app's import time; load it only once a model is needed
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    from llm_tracing import llm_tracer
+    return ChatGoogleGenerativeAI(model=model_name, temperature=temperature, callbacks=[llm_tracer])
 
 
-def get_transcript(video_url):
+def check_prompt(messages):
+    """Returns the prompt's estimated tokens, raising ValueError if it is over MAX_PROMPT_TOKENS."""
+    estimate = tokens.estimate_messages(messages)
+    if estimate > MAX_PROMPT_TOKENS:
+        raise ValueError(f"prompt is about {estimate:,} tokens, over the {MAX_PROMPT_TOKENS:,} limit")
+    return estimate
+
+def stream_response(llm, messages, stats=None):
     """
-    Retrieves the transcript of a YouTube video given its URL.
-    Using `YouTubeTranscriptApi` instance method `fetch`.
+    Yields the model's answer as text chunks as they arrive.
+    If `stats` is given, it is filled with `ttft` (seconds to first token), `total`,
+    `prompt_estimate` (tokens, estimated before the call) and the call's usage
+    (see tokens.add_usage): as reported by the model, else estimated.
+    """
+    prompt_estimate = check_prompt(messages)
+    start = time.perf_counter()
+    usage, parts = None, []
+    for chunk in llm.stream(messages):
+        # Gemini reports usage on the last chunk; chunk usage adds up like LangChain's chunks do
+        reported = tokens.reported(chunk)
+        if reported is not None:
+            usage = reported if usage is None else (usage[0] + reported[0], usage[1] + reported[1])
+        text = chunk.text
+        if not text:
+            continue
+        if stats is not None and "ttft" not in stats:
+            stats["ttft"] = time.perf_counter() - start
+        parts.append(text)
+        yield text
+    if stats is not None:
+        stats.setdefault("ttft", time.perf_counter() - start)
+        stats["total"] = time.perf_counter() - start
+        stats["prompt_estimate"] = prompt_estimate
+        tokens.add_usage(stats, *(usage or (prompt_estimate, tokens.estimate("".join(parts)))))
+
+def record_usage(video_id, stats):
+    """Adds the model calls counted in `stats` (see tokens.add_usage) to a video's usage totals."""
+    if stats.get("calls"):
+        database.add_usage(video_id, stats["calls"], stats["prompt_tokens"], stats["completion_tokens"])
+
+def stream_cached(llm, build_messages, youtube_id, history, context_mode, stats=None):
+    """
+    Like stream_response, but answers the last user turn of `history` from the
+    response cache when possible. `context_mode` is the resolved mode the prompt is
+    built in, so answers from different contexts are cached apart. `build_messages`
+    is only called on a miss, so expensive prompt building is skipped for cached
+    answers. Fresh answers are stored once the stream completes.
+    """
+    question = history[-1][1]
+    key = response_cache.make_key(youtube_id, question, history[:-1], MODEL_NAME, TEMPERATURE, context_mode)
+    cached = response_cache.lookup(key)
+    if cached is not None:
+        if stats is not None:
+            stats.update(ttft=0.0, total=0.0, cached=True)
+        yield cached
+        return
+
+    parts = []
+    for text in stream_response(llm, build_messages(), stats):
+        parts.append(text)
+        yield text
+    response_cache.store(key, youtube_id, MODEL_NAME, "".join(parts))
+
+def strip_suggestions(text):
+    """Drops the trailing "Suggested Questions" block from an answer."""
+    return text.split("**Suggested Questions:**")[0].strip()
+
+def summary_context(llm, transcript):
+    """Context for the initial summary: long transcripts are condensed by map-reduce first."""
+    if summarizer.estimate_tokens(transcript) > summarizer.LONG_TRANSCRIPT_TOKENS:
+        return summarizer.condense(llm, transcript)
+    return transcript
+
+def generate_summary(llm, video_id, stats=None):
+    """
+    The initial summary of a stored video, answered in one call; long videos are summarized
+    from their map-reduced notes (see build_system_instruction). The model usage is added
+    to `stats` if given.
+    """
+    from langchain_core.messages import HumanMessage, SystemMessage
+    messages = [SystemMessage(content=build_system_instruction(video_id, None, CONTEXT_MODE, llm, stats)),
+                HumanMessage(content=SUMMARY_REQUEST)]
+    check_prompt(messages)
+    response = llm.invoke(messages)
+    tokens.add_response_usage(stats, messages, response)
+    return response.text
+
+def choose_context_mode(context_mode, transcript_tokens):
+    """The mode to use for a transcript of `transcript_tokens`: `context_mode`, or for "auto" the one its size calls for."""
+    if context_mode == "auto":
+        if transcript_tokens <= FULL_CONTEXT_TOKENS:
+            return "full"
+        return "compact" if transcript_tokens <= COMPACT_CONTEXT_TOKENS else "retrieval"
+    if context_mode == "full" and transcript_tokens > MAX_PROMPT_TOKENS:
+        return "compact"
+    return context_mode
+
+def video_context_mode(video_id, context_mode):
+    """(mode, transcript_tokens) for a stored video: `context_mode` resolved by choose_context_mode."""
+    transcript_tokens = database.get_transcript_tokens(video_id)
+    if transcript_tokens is None:
+        # Evicted before token counts were kept; storing it again counts it
+        transcripts.load(video_id)
+        transcript_tokens = database.get_transcript_tokens(video_id) or 0
+    return choose_context_mode(context_mode, transcript_tokens), transcript_tokens
+
+def video_notes(llm, video_id, stats=None):
+    """Map-reduced notes on a stored video, condensed on first use and then kept in the database."""
+    notes = database.load_notes(video_id)
+    if notes is None:
+        notes = summarizer.condense(llm, transcripts.load(video_id), usage=stats)
+        database.save_notes(video_id, notes)
+    return notes
+
+def build_system_instruction(video_id, question, context_mode, llm, stats=None):
+    """
+    Builds the system prompt for a stored video; this is the only place the transcript is loaded.
+    The context mode is picked by `choose_context_mode` from the transcript's stored token
+    count, before any of it is read. The initial summary sees the whole video: long
+    transcripts as their map-reduced notes. After that, "full" sends the transcript, and
+    "compact" and "retrieval" send the notes or the summary plus the chunks relevant to the
+    latest question. `stats`, if given, gets `context_mode`, `transcript_tokens` and the
+    usage of any map-reduce calls.
+    """
+    mode, transcript_tokens = video_context_mode(video_id, context_mode)
+    if stats is not None:
+        stats.update(context_mode=mode, transcript_tokens=transcript_tokens)
+
+    summary = database.get_video_summary(video_id)
+    if summary is None or not question:
+        if transcript_tokens > summarizer.LONG_TRANSCRIPT_TOKENS:
+            return SYSTEM_PROMPT.format(transcript=video_notes(llm, video_id, stats))
+        return SYSTEM_PROMPT.format(transcript=transcripts.load(video_id))
+    if mode == "full":
+        return SYSTEM_PROMPT.format(transcript=transcripts.load(video_id))
+
+    overview = video_notes(llm, video_id, stats) if mode == "compact" else strip_suggestions(summary)
+    index = retrieval.get_index(video_id)
+    if index is None:
+        # Fetches an evicted transcript again, and with it the index
+        transcripts.load(video_id)
+        index = retrieval.get_index(video_id)
+    if index is None:
+        return SYSTEM_PROMPT.format(transcript=overview)
+    context = retrieval.build_context(index, question, overview, RETRIEVAL_TOP_K, segments.load(video_id))
+    return SYSTEM_PROMPT.format(transcript=context)
+
+def extract_video_id(video_url):
+    """Returns the video ID from a watch/short URL, or the input itself if it is already an ID."""
+    if "v=" in video_url:
+        return video_url.split("v=")[1].split("&")[0]
+    elif "youtu.be" in video_url:
+        return video_url.split("/")[-1]
+    return video_url
+
+def get_segments(video_url):
+    """
+    Retrieves the time-coded transcript of a YouTube video given its URL, as
+    `segments.Segments` (its `text` is the plain transcript), or None.
+    Stored videos are read from the library; see `transcripts` for fetching.
     """
     try:
-        if "v=" in video_url:
-            video_id = video_url.split("v=")[1].split("&")[0]
-        elif "youtu.be" in video_url:
-             video_id = video_url.split("/")[-1]
-        else:
-             video_id = video_url
+        video_id = extract_video_id(video_url)
     except Exception:
         console.print("[bold red]Error:[/bold red] Could not extract video ID.")
         return None
 
     try:
-        api = YouTubeTranscriptApi()
-        transcript_list = api.fetch(video_id)
-        transcript_text = " ".join([i.text for i in transcript_list])
-        return transcript_text
+        return transcripts.get(video_id)
     except Exception as e:
         console.print(f"[bold red]Error retrieving transcript:[/bold red] {e}")
         return None
 
-def main():
+def get_transcript(video_url):
+    """Retrieves the plain transcript text of a YouTube video given its URL."""
+    result = get_segments(video_url)
+    return result.text if result else None
+
+# Stored when no title could be resolved; the job queue retries these later
+UNKNOWN_TITLE = "Unknown Video"
+
+def get_video_title(url):
+    with tracing.span("title"):
+        title = titles.get_title(extract_video_id(url))
+    return title if title else UNKNOWN_TITLE
+
+def submit(fn, *args):
+    """Runs `fn` on the fetch pool in a copy of the caller's context, so its trace records join the caller's."""
+    return fetch_pool.submit(contextvars.copy_context().run, fn, *args)
+
+def ingest_video(url, llm=None):
+    """
+    Fetches and stores a new video as a pipeline. Returns (db_id, notes), or
+    (None, None) if there is no transcript.
+
+    The title lookup runs while the transcript downloads. As soon as the
+    transcript is in, a long one starts being condensed for the summary (when
+    `llm` is given) while its chunk index is built and the video is written.
+    `notes` is that condensed context, stored with the video, or None when the
+    transcript is short enough to summarize as is.
+    """
+    video_id = extract_video_id(url)
+    title = submit(get_video_title, url)
+    fetched = get_segments(url)
+    if not fetched or not fetched.text:
+        title.cancel()
+        return None, None
+    transcript = fetched.text
+
+    notes, usage = None, {}
+    if llm is not None and summarizer.estimate_tokens(transcript) > summarizer.LONG_TRANSCRIPT_TOKENS:
+        notes = submit(summarizer.condense, llm, transcript, summarizer.WINDOW_TOKENS, summarizer.MAX_WORKERS, usage)
+    index = retrieval.ChunkIndex.from_transcript(transcript)
+    title = title.result()
+    with tracing.span("ingest.save"), database.transaction():
+        db_id = database.save_video(video_id, title, transcript)
+        database.save_chunk_index(db_id, index.to_bytes())
+        segments.save(db_id, fetched)
+    if notes is None:
+        return db_id, None
+    notes = notes.result()
+    with database.transaction():
+        database.save_notes(db_id, notes)
+        record_usage(db_id, usage)
+    return db_id, notes
+
+def list_library(limit):
+    """Prints the newest `limit` stored videos. Only SQLite is touched, so this starts in a blink."""
+    database.init_db()
+    rows, _ = database.get_videos_page(limit)
+    for pk, youtube_id, title in rows:
+        print(f"{pk:>6}  {youtube_id}  {title}")
+
+def search_library(query):
+    """Prints the library search results for `query`, best match per video."""
+    database.init_db()
+    for pk, youtube_id, title, kind, snippet in database.search(query):
+        print(f"{pk:>6}  {youtube_id}  {title}\n        {kind}: {snippet}")
+
+def chat():
+    # rich's live rendering is only needed by the interactive chat
+    from rich.live import Live
+    from rich.markdown import Markdown
+    from rich.panel import Panel
+    from rich.prompt import Prompt
+
     console.print(Panel.fit("[bold blue]YouTube Video Summarizer & Chat[/bold blue]", border_style="blue"))
 
     # API Key Handling
@@ -70,69 +361,103 @@ def main():
 
     # User Input for URL
     video_url = Prompt.ask("[bold green]Enter YouTube Video URL[/bold green]")
-    
+
+    # Videos already in the library (e.g. added in the web app) are read from it, not refetched
+    database.init_db()
     with console.status("[bold green]Fetching transcript...[/bold green]", spinner="dots"):
-        transcript = get_transcript(video_url)
+        fetched = get_segments(video_url)
 
-    if not transcript:
+    if not fetched or not fetched.text:
         return
+    transcript = fetched.text
 
     console.print("[bold green]Transcript fetched successfully![/bold green]")
 
     # Initialize LLM
-    llm = ChatGoogleGenerativeAI(model=MODEL_NAME, temperature=0.7)
+    llm = get_model()
+    tracing.start_metrics_server()
+    youtube_id = extract_video_id(video_url)
 
     # Chat Loop with Memory
-    # We maintain a simple list of messages
-    messages = [
-        SystemMessage(content=f"""
-You are a helpful assistant.
-Your goal is to answer questions based on the video content provided below.
-CRITICAL INSTRUCTION: Do NOT mention "the transcript", "the text", or "according to the video" in your responses. 
-Act as if you just watched the video and know the information naturally.
-After answering the user's question, you MUST provide 3 short "Next Question" suggestions relevant to the context.
-Format the suggestions clearly at the end of your response like this:
-
-**Suggested Questions:**
-1. ...
-2. ...
-3. ...
-
-Context Data:
-{transcript}
-""")
-    ]
+    # We keep the conversation as (role, content) turns; older turns are
+    # folded into a running summary so each prompt stays roughly the same size.
+    mode = choose_context_mode(CONTEXT_MODE, tokens.estimate(transcript))
+    with console.status("[bold green]Preparing context...[/bold green]", spinner="dots"):
+        context = summary_context(llm, transcript)
+    notes = context if context is not transcript else None
 
     # Initial Summary Request (simulated as the first user "trigger")
-    initial_trigger = "Please provide a short summary paragraph of the video content."
-    messages.append(HumanMessage(content=initial_trigger))
+    turns = [("user", SUMMARY_REQUEST)]
+    conversation_summary = None
+
+    # The summary always sees the whole transcript; in compact and retrieval mode
+    # later turns only get the notes or summary plus the chunks relevant to the question.
+    index = retrieval.ChunkIndex.from_transcript(transcript) if mode != "full" else None
+    summary = None
 
     console.print(Panel("[bold yellow]Generating Summary...[/bold yellow]", border_style="yellow"))
     
     while True:
         try:
-            with console.status("[bold blue]Thinking...[/bold blue]", spinner="dots"):
-                response = llm.invoke(messages)
-            
-            # Display Response
-            console.print(Markdown(response.content))
+            conversation_summary, _, turns = conversation.compact(llm, conversation_summary, turns)
+            messages = conversation.to_messages(SYSTEM_PROMPT.format(transcript=context), conversation_summary, turns)
+
+            # Stream the response, re-rendering the markdown as chunks arrive
+            content = ""
+            stats = {}
+            with Live(refresh_per_second=12, vertical_overflow="visible") as live:
+                live.update(Markdown("*Thinking...*"))
+                history = conversation.cache_history(conversation_summary, turns)
+                for text in stream_cached(llm, lambda: messages, youtube_id, history, mode, stats):
+                    content += text
+                    live.update(Markdown(content))
+            if stats.get("cached"):
+                console.print("[dim]served from response cache[/dim]")
+            else:
+                console.print(f"[dim]first token {stats['ttft']:.2f}s · total {stats['total']:.2f}s · "
+                              f"{stats['prompt_tokens']:,} prompt + {stats['completion_tokens']:,} "
+                              f"completion tokens[/dim]")
             console.print("-" * 50)
             
             # Add response to memory
-            messages.append(AIMessage(content=response.content))
+            turns.append(("ai", content))
+            if summary is None:
+                summary = strip_suggestions(content)
+                # The condensed notes were only for the summary; follow-ups see the real transcript
+                context = transcript
 
             # Next User Input
             user_input = Prompt.ask("[bold cyan]You (or type 'exit')[/bold cyan]")
             
             if user_input.lower() in ["exit", "quit", "q"]:
+                cache = response_cache.stats()
+                console.print(f"[dim]response cache: {cache['hits']} hits, {cache['misses']} misses[/dim]")
                 console.print("[bold green]Goodbye![/bold green]")
                 break
             
-            messages.append(HumanMessage(content=user_input))
+            turns.append(("user", user_input))
+            if index is not None:
+                overview = notes if mode == "compact" and notes else summary
+                context = retrieval.build_context(index, user_input, overview, RETRIEVAL_TOP_K, fetched)
 
         except Exception as e:
             console.print(f"[bold red]Error encountered:[/bold red] {e}")
             break
 
+def main():
+    parser = argparse.ArgumentParser(description="Summarize a YouTube video and chat about it in the terminal.")
+    parser.add_argument("--list", nargs="?", const=50, type=int, metavar="N",
+                        help="print the newest N stored videos (default 50) and exit")
+    parser.add_argument("--search", metavar="QUERY", help="search stored titles, transcripts and chats, and exit")
+    args = parser.parse_args()
+
+    if args.list is not None:
+        list_library(args.list)
+    elif args.search:
+        search_library(args.search)
+    else:
+        chat()
+    return 0
+
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,188 @@
+"""
+Keeps the library database from growing without bound.
+
+  evict    Drops the transcripts (with their chunk indexes and segments) of
+           videos not opened for --evict-after-days. Then, while the stored
+           transcripts together exceed --max-transcript-mb, drops the least
+           recently opened ones. The video, its title and its chat stay; the
+           transcript is fetched again the next time the video is used.
+  archive  Takes chats with no new message for --archive-after-days and moves
+           every message after the initial summary into a gzip'd JSON-lines
+           archive next to the database (<db>.archive.jsonl.gz). Restore one
+           with --restore YOUTUBE_ID.
+  vacuum   Hands the freed pages back to the filesystem with incremental
+           vacuum. The first run on an older database converts it with one
+           full VACUUM.
+
+Prints what was reclaimed. Safe to run while the app is serving; schedule it
+with cron or a systemd timer.
+
+    uv run maintenance.py --evict-after-days 90 --max-transcript-mb 500 --archive-after-days 180
+    uv run maintenance.py --dry-run
+    uv run maintenance.py --restore dQw4w9WgXcQ
+"""
+import argparse
+import datetime
+import gzip
+import json
+import os
+import sys
+import time
+
+import database
+from main import console
+
+EVICT_AFTER_DAYS = 90
+ARCHIVE_AFTER_DAYS = 180
+# Rows changed per transaction, so the app's writes are never held up for long
+BATCH = 500
+DAY = 86400
+
+
+def archive_path():
+    return os.path.splitext(database.DB_NAME)[0] + ".archive.jsonl.gz"
+
+
+def file_bytes():
+    """The database file plus its WAL."""
+    return sum(os.path.getsize(path) for path in (database.DB_NAME, database.DB_NAME + "-wal")
+               if os.path.exists(path))
+
+
+def evict(opened_before, max_bytes=None, dry_run=False):
+    """
+    Evicts transcripts opened before `opened_before` (epoch seconds), then least
+    recently opened ones while more than `max_bytes` are stored. Returns (videos, bytes).
+    """
+    stored = database.get_stored_transcripts()
+    total = sum(size for _, _, size in stored)
+    victims, freed = [], 0
+    for video_id, opened_at, size in stored:
+        if (opened_at or 0) >= opened_before and (max_bytes is None or total <= max_bytes):
+            break
+        victims.append(video_id)
+        total -= size
+        freed += size
+    if not dry_run:
+        for start in range(0, len(victims), BATCH):
+            database.evict_transcripts(victims[start:start + BATCH])
+    return len(victims), freed
+
+
+def archive(idle_before, dry_run=False):
+    """
+    Moves the messages after the initial summary of chats idle since `idle_before`
+    (epoch seconds) to the archive file. Returns (chats, messages, archive bytes written).
+    """
+    chats = database.get_idle_chats(datetime.datetime.fromtimestamp(idle_before))
+    entries = []
+    for video_id, youtube_id, title in chats:
+        messages = database.get_messages_after_summary(video_id)
+        if messages:
+            entries.append((video_id, {"youtube_id": youtube_id, "title": title, "archived_at": time.time(),
+                                       "messages": [list(m) for m in messages]}))
+    count = sum(len(entry["messages"]) for _, entry in entries)
+    if dry_run or not entries:
+        return len(entries), count, 0
+
+    path = archive_path()
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    # Each run appends one gzip member; readers see the members as one stream
+    with open(path, "ab") as raw:
+        with gzip.open(raw, "wt", encoding="utf-8") as f:
+            for _, entry in entries:
+                f.write(json.dumps(entry, default=str) + "\n")
+        raw.flush()
+        os.fsync(raw.fileno())
+    # Only deleted once the archive is safely on disk
+    ids = [m[0] for _, entry in entries for m in entry["messages"]]
+    for start in range(0, len(ids), BATCH):
+        database.delete_messages(ids[start:start + BATCH])
+    return len(entries), count, os.path.getsize(path) - size
+
+
+def restore(youtube_id):
+    """Puts a video's archived messages back into its chat. Returns how many were restored."""
+    video = database.get_video(youtube_id)
+    if video is None:
+        raise ValueError(f"{youtube_id} is not in the library")
+    path = archive_path()
+    if not os.path.exists(path):
+        return 0
+    messages = []
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            if entry["youtube_id"] == youtube_id:
+                messages.extend(entry["messages"])
+    return database.restore_messages(video[0], messages) if messages else 0
+
+
+def run(evict_after_days=EVICT_AFTER_DAYS, max_transcript_bytes=None, archive_after_days=ARCHIVE_AFTER_DAYS,
+        dry_run=False):
+    """Evicts, archives and vacuums. Returns a report of what was (or, with `dry_run`, would be) reclaimed."""
+    now = time.time()
+    size_before = file_bytes()
+    evicted, evicted_bytes = evict(now - evict_after_days * DAY, max_transcript_bytes, dry_run)
+    chats, messages, archive_bytes = archive(now - archive_after_days * DAY, dry_run)
+
+    page_size, _, free_pages, auto_vacuum = database.page_stats()
+    # auto_vacuum 2 is INCREMENTAL; anything else needs one full VACUUM to switch
+    converted = auto_vacuum != 2
+    freed_pages = free_pages if dry_run else database.vacuum(incremental=not converted)
+    return {
+        "transcripts_evicted": evicted,
+        "transcript_bytes_evicted": evicted_bytes,
+        "chats_archived": chats,
+        "messages_archived": messages,
+        "archive_bytes_written": archive_bytes,
+        "pages_freed": freed_pages,
+        "converted_to_incremental_vacuum": converted,
+        "file_bytes_before": size_before,
+        "file_bytes_after": size_before if dry_run else file_bytes(),
+        "page_size": page_size,
+        "dry_run": dry_run,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--evict-after-days", type=float, default=EVICT_AFTER_DAYS,
+                        help="evict transcripts of videos not opened for this long")
+    parser.add_argument("--max-transcript-mb", type=float,
+                        help="also evict least recently opened transcripts while more than this is stored")
+    parser.add_argument("--archive-after-days", type=float, default=ARCHIVE_AFTER_DAYS,
+                        help="archive chats with no new message for this long")
+    parser.add_argument("--dry-run", action="store_true", help="report what would be reclaimed, change nothing")
+    parser.add_argument("--restore", metavar="YOUTUBE_ID", help="restore a video's archived chat and exit")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.restore:
+        try:
+            restored = restore(args.restore)
+        except ValueError as e:
+            console.print(f"[bold red]Error:[/bold red] {e}")
+            return 1
+        console.print(f"[bold green]Restored {restored} messages.[/bold green]")
+        return 0
+
+    max_bytes = int(args.max_transcript_mb * 1024 * 1024) if args.max_transcript_mb is not None else None
+    report = run(args.evict_after_days, max_bytes, args.archive_after_days, args.dry_run)
+    mib = 1024 * 1024
+    verb = "Would reclaim" if args.dry_run else "Reclaimed"
+    console.print(
+        f"[bold green]{verb}:[/bold green] {report['transcripts_evicted']} transcripts "
+        f"({report['transcript_bytes_evicted'] / mib:.1f} MiB), {report['messages_archived']} messages from "
+        f"{report['chats_archived']} chats ({report['archive_bytes_written'] / mib:.1f} MiB archived), "
+        f"{report['pages_freed']} free pages ({report['pages_freed'] * report['page_size'] / mib:.1f} MiB)")
+    if not args.dry_run:
+        console.print(f"Database: {report['file_bytes_before'] / mib:.1f} MiB -> "
+                      f"{report['file_bytes_after'] / mib:.1f} MiB"
+                      + (" (converted to incremental vacuum)" if report["converted_to_incremental_vacuum"] else ""))
+    console.print(json.dumps(report), markup=False, highlight=False)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
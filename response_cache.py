@@ -0,0 +1,54 @@
+import hashlib
+import re
+import threading
+import time
+
+import database
+
+# Cached answers older than this are never served
+TTL_SECONDS = 7 * 24 * 3600
+# Total size of cached answers kept; least recently used go first
+MAX_BYTES = 50_000_000
+# Check the size bound once every this many stores
+EVICT_EVERY = 50
+
+_stats = {"hits": 0, "misses": 0, "stores": 0}
+_lock = threading.Lock()
+
+def normalize_question(question):
+    """Lowercases, collapses whitespace and drops trailing punctuation, so trivial variants share a key."""
+    return re.sub(r"\s+", " ", question.lower()).strip().rstrip("?!. ")
+
+def make_key(youtube_id, question, prior_turns, model, temperature, context_mode):
+    """
+    Cache key for answering `question` about a video after the conversation `prior_turns`
+    ([(role, content), ...]), with the prompt built in `context_mode` (as resolved by
+    main.choose_context_mode, never "auto"). The first question of a conversation has an
+    empty prefix, so it is shared across sessions and databases.
+    """
+    prefix = hashlib.sha256()
+    for role, content in prior_turns:
+        prefix.update(f"{role}\x00{content}\x00".encode("utf-8"))
+    raw = "\x1f".join([youtube_id, normalize_question(question), prefix.hexdigest(), model, repr(float(temperature)),
+                      context_mode])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def _count(name):
+    with _lock:
+        _stats[name] += 1
+        return _stats[name]
+
+def lookup(key):
+    response = database.get_cached_response(key, time.time() - TTL_SECONDS)
+    _count("hits" if response is not None else "misses")
+    return response
+
+def store(key, youtube_id, model, response):
+    database.put_cached_response(key, youtube_id, model, response)
+    if _count("stores") % EVICT_EVERY == 0:
+        database.evict_cached_responses(time.time() - TTL_SECONDS, MAX_BYTES)
+
+def stats():
+    """Returns a copy of the hit/miss/store counters for this process."""
+    with _lock:
+        return dict(_stats)
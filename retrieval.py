@@ -0,0 +1,167 @@
+import io
+import re
+
+import database
+import segments
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Chunking: overlapping windows of words, so an answer that straddles a
+# boundary still lands whole in at least one chunk.
+CHUNK_WORDS = 180
+CHUNK_OVERLAP = 30
+
+# BM25 parameters (standard defaults)
+K1 = 1.5
+B = 0.75
+
+TOKEN_RE = re.compile(r"\w+")
+STOPWORDS = frozenset("""
+a an and are as at be but by do for from has have he her his i if in is it its me my
+of on or our she so that the their them then there they this to was we were what when
+which who will with you your
+""".split())
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+def chunk_step(size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    """Words between the starts of consecutive chunks; chunk n starts at word n * chunk_step()."""
+    return max(size - overlap, 1)
+
+
+def chunk_text(text, size=CHUNK_WORDS, overlap=CHUNK_OVERLAP):
+    words = text.split()
+    if not words:
+        return []
+    step = chunk_step(size, overlap)
+    return [" ".join(words[i:i + size]) for i in range(0, max(len(words) - overlap, 1), step)]
+
+
+class ChunkIndex:
+    """
+    BM25 index over the chunks of one transcript.
+
+    Postings are stored term-major in flat NumPy arrays (`term_ptr`, `doc_ids`,
+    `tfs`), so scoring a query is a handful of vectorized slices and one
+    `np.add.at`, and the whole index round-trips through a single .npz blob.
+    """
+
+    def __init__(self, chunks, vocab, term_ptr, doc_ids, tfs, doc_len):
+        self.chunks = chunks
+        self.vocab = vocab
+        self.term_ptr = term_ptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        n_docs = len(chunks)
+        df = np.diff(term_ptr)
+        self.idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+        self.avg_len = float(doc_len.mean()) if n_docs else 0.0
+
+    @classmethod
+    def from_transcript(cls, transcript):
+        chunks = chunk_text(transcript)
+        postings = {}
+        doc_len = np.zeros(len(chunks), dtype=np.int32)
+        for doc, chunk in enumerate(chunks):
+            tokens = tokenize(chunk)
+            doc_len[doc] = len(tokens)
+            for token in tokens:
+                counts = postings.setdefault(token, {})
+                counts[doc] = counts.get(doc, 0) + 1
+
+        vocab = {term: i for i, term in enumerate(sorted(postings))}
+        term_ptr = np.zeros(len(vocab) + 1, dtype=np.int64)
+        doc_ids, tfs = [], []
+        for term, i in vocab.items():
+            counts = postings[term]
+            doc_ids.extend(counts.keys())
+            tfs.extend(counts.values())
+            term_ptr[i + 1] = len(doc_ids)
+        return cls(chunks, vocab, term_ptr,
+                   np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32), doc_len)
+
+    def search(self, query, k=5):
+        """Returns the top-k (chunk_no, score, text) for a query, best first."""
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids or not self.chunks:
+            return []
+
+        spans = [np.arange(self.term_ptr[t], self.term_ptr[t + 1]) for t in term_ids]
+        lengths = [len(span) for span in spans]
+        positions = np.concatenate(spans)
+        docs = self.doc_ids[positions]
+        tf = self.tfs[positions]
+        idf = np.repeat(self.idf[term_ids], lengths)
+
+        norm = K1 * (1 - B + B * self.doc_len[docs] / self.avg_len)
+        scores = np.zeros(len(self.chunks), dtype=np.float32)
+        np.add.at(scores, docs, idf * tf * (K1 + 1) / (tf + norm))
+
+        k = min(k, int(np.count_nonzero(scores)))
+        if k == 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i]), self.chunks[i]) for i in top]
+
+    def to_bytes(self):
+        text = "\x00".join(self.chunks).encode("utf-8")
+        vocab = "\n".join(self.vocab).encode("utf-8")
+        buf = io.BytesIO()
+        np.savez_compressed(buf, text=np.frombuffer(text, dtype=np.uint8),
+                            vocab=np.frombuffer(vocab, dtype=np.uint8),
+                            term_ptr=self.term_ptr, doc_ids=self.doc_ids, tfs=self.tfs, doc_len=self.doc_len)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data):
+        arrays = np.load(io.BytesIO(data))
+        text = arrays["text"].tobytes().decode("utf-8")
+        vocab = arrays["vocab"].tobytes().decode("utf-8")
+        chunks = text.split("\x00") if text else []
+        terms = vocab.split("\n") if vocab else []
+        return cls(chunks, {t: i for i, t in enumerate(terms)},
+                   arrays["term_ptr"], arrays["doc_ids"], arrays["tfs"], arrays["doc_len"])
+
+
+def index_video(video_id, transcript):
+    """Builds the chunk index for a stored video and persists it next to the video."""
+    index = ChunkIndex.from_transcript(transcript)
+    database.save_chunk_index(video_id, index.to_bytes())
+    return index
+
+
+def get_index(video_id):
+    """Loads a video's chunk index, building it from the stored transcript if missing."""
+    data = database.load_chunk_index(video_id)
+    if data is not None:
+        return ChunkIndex.from_bytes(data)
+    transcript = database.load_transcript(video_id)
+    if transcript is None:
+        return None
+    return index_video(video_id, transcript)
+
+
+def build_context(index, question, summary=None, k=5, video_segments=None):
+    """
+    Formats the global summary plus the top-k chunks for a question as prompt context.
+    With the video's `segments.Segments`, each excerpt is labelled with the time it starts at.
+    """
+    parts = []
+    if summary:
+        parts.append(f"Overview:\n{summary}")
+    hits = sorted(index.search(question, k))  # keep excerpts in video order
+    if hits:
+        if video_segments is not None:
+            labels = [segments.format_timestamp(video_segments.time_at_word(no * chunk_step())) for no, _, _ in hits]
+            header = "Relevant excerpts, each labelled with the time it starts in the video:\n"
+        else:
+            labels = [str(no + 1) for no, _, _ in hits]
+            header = "Relevant excerpts:\n"
+        parts.append(header + "\n\n".join(f"[{label}] {text}" for label, (_, _, text) in zip(labels, hits)))
+    return "\n\n".join(parts)
@@ -0,0 +1,115 @@
+import io
+
+import database
+from lazy import lazy_import
+
+np = lazy_import("numpy")
+
+# Joins snippet texts into the transcript; get_transcript has always used a single space
+SEPARATOR = " "
+
+
+def format_timestamp(seconds):
+    """12.5 -> "0:12", 754 -> "12:34", 3723 -> "1:02:03"."""
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+
+class Segments:
+    """
+    The time-coded snippets of one transcript in columnar form.
+
+    `text` is the transcript exactly as stored (the snippets joined by
+    SEPARATOR). Segment i starts at `start[i]` seconds, lasts `duration[i]`,
+    and spans `text[offset[i]:offset[i + 1]]` (including its trailing
+    separator) and words `word[i]` to `word[i + 1]` of `text.split()`.
+    Starts and offsets are sorted, so every lookup is a binary search.
+    """
+
+    def __init__(self, text, start, duration, offset, word):
+        self.text = text
+        self.start = start
+        self.duration = duration
+        self.offset = offset
+        self.word = word
+
+    @classmethod
+    def from_snippets(cls, snippets):
+        """Builds from objects with `text`, `start` and `duration` (e.g. a FetchedTranscript)."""
+        texts, start, duration = [], [], []
+        for snippet in snippets:
+            texts.append(snippet.text)
+            start.append(snippet.start)
+            duration.append(snippet.duration)
+        lengths = [len(t) + len(SEPARATOR) for t in texts]
+        if lengths:
+            lengths[-1] -= len(SEPARATOR)
+        offset = np.zeros(len(texts) + 1, dtype=np.uint32)
+        np.cumsum(lengths, out=offset[1:])
+        word = np.zeros(len(texts) + 1, dtype=np.uint32)
+        np.cumsum([len(t.split()) for t in texts], out=word[1:])
+        return cls(SEPARATOR.join(texts), np.asarray(start, dtype=np.float32),
+                   np.asarray(duration, dtype=np.float32), offset, word)
+
+    @classmethod
+    def from_text(cls, text):
+        """A transcript with no timing: no segments, so lookups by time or offset find none."""
+        return cls(text, np.zeros(0, dtype=np.float32), np.zeros(0, dtype=np.float32),
+                   np.zeros(1, dtype=np.uint32), np.zeros(1, dtype=np.uint32))
+
+    def __len__(self):
+        return len(self.start)
+
+    def index_at_time(self, seconds):
+        """The segment playing at `seconds` (the last one starting at or before it)."""
+        return max(int(np.searchsorted(self.start, seconds, side="right")) - 1, 0)
+
+    def text_between(self, start_s, end_s):
+        """Text of the segments overlapping [start_s, end_s)."""
+        if not len(self):
+            return ""
+        i = self.index_at_time(start_s)
+        j = max(int(np.searchsorted(self.start, end_s, side="left")), i + 1)
+        return self.text[self.offset[i]:self.offset[j]].strip()
+
+    def time_at_offset(self, offset):
+        """Start time (seconds) of the segment containing character `offset` of `text`."""
+        if not len(self):
+            return 0.0
+        i = min(int(np.searchsorted(self.offset, offset, side="right")) - 1, len(self) - 1)
+        return float(self.start[max(i, 0)])
+
+    def time_at_word(self, word):
+        """Start time (seconds) of the segment containing word number `word` of `text.split()`."""
+        if not len(self):
+            return 0.0
+        i = min(int(np.searchsorted(self.word, word, side="right")) - 1, len(self) - 1)
+        return float(self.start[max(i, 0)])
+
+    def to_bytes(self):
+        # The text is not included: it is the transcript, already stored compressed
+        buf = io.BytesIO()
+        np.savez_compressed(buf, start=self.start, duration=self.duration, offset=self.offset, word=self.word)
+        return buf.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data, text):
+        arrays = np.load(io.BytesIO(data))
+        return cls(text, arrays["start"], arrays["duration"], arrays["offset"], arrays["word"])
+
+
+def save(video_id, segments):
+    # A text-only transcript (Segments.from_text) has no timing worth keeping
+    if len(segments):
+        database.save_segments(video_id, segments.to_bytes())
+
+
+def load(video_id):
+    """A stored video's segments, or None if it was ingested before segments were kept."""
+    data = database.load_segments(video_id)
+    if data is None:
+        return None
+    text = database.load_transcript(video_id)
+    return Segments.from_bytes(data, text) if text is not None else None
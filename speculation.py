@@ -0,0 +1,158 @@
+import collections
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import response_cache
+import tracing
+
+# Speculative LLM calls in flight at once for one session
+MAX_CONCURRENT = 2
+# Shared by all sessions; each session's Speculator caps its own share
+POOL_WORKERS = 8
+
+_pool = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="speculate")
+_stats = {"started": 0, "hits": 0, "wasted": 0, "cancelled": 0, "hit_tokens": 0, "wasted_tokens": 0}
+_lock = threading.Lock()
+
+
+def _count(**amounts):
+    with _lock:
+        for name, amount in amounts.items():
+            _stats[name] += amount
+
+
+def stats():
+    """
+    Returns a copy of the process-wide counters: answers started, used (hits),
+    finished but never used (wasted), dropped before their call started or
+    failed (cancelled), and the tokens spent on used and wasted answers.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def _tokens(message):
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("total_tokens", 0)
+
+
+class Speculator:
+    """
+    Answers one round of suggested questions in the background for a session.
+
+    A round is identified by its `basis` (anything that changes when the
+    conversation does, e.g. the video and its last message). Starting a new
+    round, taking one answer, or calling `discard` drops the rest of the round;
+    answers that were already generated count as wasted.
+    """
+
+    def __init__(self, max_concurrent=MAX_CONCURRENT):
+        self._max_concurrent = max_concurrent
+        self._running = 0
+        # (future, answer, question) not yet handed to the shared pool
+        self._queue = collections.deque()
+        # Reentrant: a done-callback runs at once (under the lock) if its call already finished
+        self._lock = threading.RLock()
+        self._basis = None
+        self._pending = {}
+
+    def is_current(self, basis):
+        """True if the round for `basis` has already been started."""
+        with self._lock:
+            return basis == self._basis
+
+    def start(self, basis, questions, answer):
+        """Schedules `answer(question)` (returning an AI message) for each question, once per basis."""
+        with self._lock:
+            if basis == self._basis:
+                return
+            self._drop()
+            self._basis = basis
+            for question in questions:
+                key = response_cache.normalize_question(question)
+                if key not in self._pending:
+                    future = Future()
+                    self._pending[key] = future
+                    self._queue.append((future, answer, question))
+                    _count(started=1)
+            self._submit_ready()
+
+    def _submit_ready(self):
+        # Called with self._lock held. Only max_concurrent calls per session are on the
+        # shared pool at a time; the next is submitted as one finishes, so a session
+        # never ties up a pool thread waiting for its own turn.
+        while self._queue and self._running < self._max_concurrent:
+            future, answer, question = self._queue.popleft()
+            if future.cancelled():
+                continue
+            try:
+                task = _pool.submit(_run, future, answer, question)
+            except RuntimeError:
+                # The interpreter is shutting down
+                future.cancel()
+                continue
+            self._running += 1
+            task.add_done_callback(self._finished)
+
+    def _finished(self, _):
+        with self._lock:
+            self._running -= 1
+            self._submit_ready()
+
+    def take(self, basis, question):
+        """
+        Waits for and returns the pre-generated answer text for `question`, or
+        None if it was not speculated in this round or failed. Ends the round.
+        """
+        with self._lock:
+            entry = self._pending.pop(response_cache.normalize_question(question), None) \
+                if basis == self._basis else None
+            self._drop()
+        if entry is None:
+            return None
+        start = time.perf_counter()
+        try:
+            message = entry.result()
+        except Exception:
+            message = None
+        if message is None:
+            return None
+        tokens = _tokens(message)
+        _count(hits=1, hit_tokens=tokens)
+        tracing.record("speculation.hit", time.perf_counter() - start, tokens=tokens)
+        return message.text
+
+    def discard(self):
+        """Drops the current round (the user asked something else)."""
+        with self._lock:
+            self._drop()
+
+    def _drop(self):
+        # Called with self._lock held
+        for future in self._pending.values():
+            if future.cancel():
+                _count(cancelled=1)
+            else:
+                future.add_done_callback(_wasted)
+        self._pending = {}
+        self._basis = None
+
+
+def _run(future, answer, question):
+    # The round may have been dropped while this call waited for a pool thread
+    if not future.set_running_or_notify_cancel():
+        return
+    try:
+        future.set_result(answer(question))
+    except BaseException as e:
+        future.set_exception(e)
+
+
+def _wasted(future):
+    if future.cancelled() or future.exception() is not None or future.result() is None:
+        _count(cancelled=1)
+        return
+    tokens = _tokens(future.result())
+    _count(wasted=1, wasted_tokens=tokens)
+    tracing.record("speculation.wasted", 0.0, tokens=tokens)
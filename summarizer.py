@@ -0,0 +1,80 @@
+import tokens
+from tokens import CHARS_PER_TOKEN
+
+# Transcripts above this size get condensed by map-reduce before the summary call
+LONG_TRANSCRIPT_TOKENS = 30_000
+# Size of each map window, and the most a single reduce call is given at once
+WINDOW_TOKENS = 8_000
+# Concurrent map/reduce calls in flight
+MAX_WORKERS = 8
+
+MAP_PROMPT = """Write concise notes on this section (part {part} of {total}) of a video.
+Keep names, numbers, definitions and key claims; drop filler and repetition.
+
+{text}"""
+
+REDUCE_PROMPT = """These are notes on consecutive sections of one video.
+Merge them into a single set of concise notes, keeping their order and the important details.
+
+{text}"""
+
+
+estimate_tokens = tokens.estimate
+
+
+def split_windows(text, window_tokens=WINDOW_TOKENS):
+    """Splits text on whitespace into consecutive windows of at most ~window_tokens each."""
+    limit = window_tokens * CHARS_PER_TOKEN
+    windows, current, size = [], [], 0
+    for word in text.split():
+        if current and size + len(word) + 1 > limit:
+            windows.append(" ".join(current))
+            current, size = [], 0
+        current.append(word)
+        size += len(word) + 1
+    if current:
+        windows.append(" ".join(current))
+    return windows
+
+
+def _run_batch(llm, prompts, max_workers, usage=None):
+    from langchain_core.messages import HumanMessage
+    batch = [[HumanMessage(content=p)] for p in prompts]
+    responses = llm.batch(batch, config={"max_concurrency": max_workers})
+    for prompt, response in zip(batch, responses):
+        tokens.add_response_usage(usage, prompt, response)
+    return [r.text for r in responses]
+
+
+def condense(llm, transcript, window_tokens=WINDOW_TOKENS, max_workers=MAX_WORKERS, usage=None):
+    """
+    Map-reduce a transcript down to notes that fit in one window.
+
+    Map: each window is summarized concurrently (at most `max_workers` calls in
+    flight). Reduce: neighbouring notes are packed into window-sized groups and
+    merged, again concurrently, level by level until one group remains.
+    Returns the transcript unchanged if it already fits. The calls' tokens are
+    added to `usage` (see tokens.add_usage) if given.
+    """
+    if estimate_tokens(transcript) <= window_tokens:
+        return transcript
+
+    windows = split_windows(transcript, window_tokens)
+    notes = _run_batch(llm, [MAP_PROMPT.format(part=i + 1, total=len(windows), text=w)
+                             for i, w in enumerate(windows)], max_workers, usage)
+
+    while len(notes) > 1 and estimate_tokens("\n\n".join(notes)) > window_tokens:
+        groups, current = [], []
+        for note in notes:
+            if current and estimate_tokens("\n\n".join(current + [note])) > window_tokens:
+                groups.append(current)
+                current = []
+            current.append(note)
+        groups.append(current)
+        if len(groups) == len(notes):
+            # Every note is already window-sized on its own; merging pairs still shrinks the level
+            groups = [notes[i:i + 2] for i in range(0, len(notes), 2)]
+        notes = _run_batch(llm, [REDUCE_PROMPT.format(text="\n\n".join(g)) for g in groups], max_workers, usage)
+
+    return "\n\n".join(notes)
+
@@ -0,0 +1,127 @@
+import html
+import re
+import threading
+from collections import OrderedDict
+
+import tracing
+from lazy import LazyObject
+
+# (connect, read) timeouts in seconds
+TIMEOUT = (3.05, 10)
+# Small JSON endpoint with the title and channel; a few hundred bytes per video
+OEMBED_URL = "https://www.youtube.com/oembed"
+WATCH_URL = "https://www.youtube.com/watch?v={video_id}"
+# Titles remembered in-process
+CACHE_SIZE = 10_000
+
+TITLE_OPEN_RE = re.compile(rb"<title", re.IGNORECASE)
+TITLE_CLOSE_RE = re.compile(rb"</title>", re.IGNORECASE)
+
+
+def _make_session():
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    session = requests.Session()
+    session.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=32))
+    session.headers["User-Agent"] = "Mozilla/5.0 (YouTube-Video-Summarizer)"
+    return session
+
+# One pooled session shared by every thread: keeps TLS connections to YouTube alive.
+# Built on first use, since importing requests costs more than the rest of startup
+session = LazyObject(_make_session)
+
+_cache = OrderedDict()
+_lock = threading.Lock()
+_stats = {"cache_hits": 0, "oembed": 0, "page": 0, "failures": 0, "bytes": 0}
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def stats():
+    """Returns a copy of the lookup counters (by source, failures, bytes downloaded)."""
+    with _lock:
+        return dict(_stats)
+
+
+def _from_oembed(video_id):
+    r = session.get(OEMBED_URL, params={"url": WATCH_URL.format(video_id=video_id), "format": "json"},
+                    timeout=TIMEOUT)
+    _count("bytes", len(r.content))
+    r.raise_for_status()
+    data = r.json()
+    return {"title": data["title"], "author": data.get("author_name")}, len(r.content)
+
+
+def _from_page(video_id, chunk_size=16_384, max_bytes=1_000_000):
+    """
+    Streams the watch page and stops as soon as the <title> element has arrived.
+    Each byte is scanned once: every search resumes just before where the last
+    one ended, far enough back to catch a tag split across chunks.
+    """
+    received, scanned = bytearray(), 0
+    tag_at = content_at = raw_title = None
+    with session.get(WATCH_URL.format(video_id=video_id), timeout=TIMEOUT, stream=True) as r:
+        r.raise_for_status()
+        for chunk in r.iter_content(chunk_size):
+            received += chunk
+            if tag_at is None:
+                match = TITLE_OPEN_RE.search(received, max(0, scanned - len(b"<title") + 1))
+                tag_at = match.end() if match else None
+            if tag_at is not None and content_at is None:
+                end = received.find(b">", max(tag_at, scanned))
+                content_at = end + 1 if end != -1 else None
+            if content_at is not None:
+                match = TITLE_CLOSE_RE.search(received, max(content_at, scanned - len(b"</title>") + 1))
+                if match:
+                    raw_title = bytes(received[content_at:match.start()])
+                    break
+            scanned = len(received)
+            if scanned >= max_bytes:
+                break
+    _count("bytes", len(received))
+    if raw_title is None:
+        raise ValueError("no <title> in page")
+    title = html.unescape(raw_title.decode("utf-8", "replace")).strip()
+    return {"title": title.removesuffix(" - YouTube"), "author": None}, len(received)
+
+
+def get_metadata(video_id):
+    """
+    Returns {"title", "author"} for a video, or None if it cannot be resolved.
+    Tries the oEmbed endpoint first and falls back to the head of the watch page.
+    Successful lookups are cached.
+    """
+    with _lock:
+        cached = _cache.get(video_id)
+        if cached is not None:
+            _cache.move_to_end(video_id)
+            _stats["cache_hits"] += 1
+            return cached
+
+    metadata = None
+    for source, fetch in (("oembed", _from_oembed), ("page", _from_page)):
+        with tracing.span(f"title.{source}") as info:
+            try:
+                metadata, info["bytes"] = fetch(video_id)
+            except Exception:
+                continue
+        _count(source)
+        break
+    if metadata is None:
+        _count("failures")
+        return None
+
+    with _lock:
+        _cache[video_id] = metadata
+        if len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return metadata
+
+
+def get_title(video_id):
+    metadata = get_metadata(video_id)
+    return metadata["title"] if metadata else None
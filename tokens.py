@@ -0,0 +1,48 @@
+"""
+Token estimates and usage accounting.
+
+Counting with Gemini's tokenizer takes a network round trip, so sizes are
+estimated from character counts instead. The estimate is computed once when a
+transcript or message is stored (see database.py), and for each prompt before
+it is sent. Real usage is read from the model's `usage_metadata` when it
+reports it, falling back to the estimates.
+"""
+
+# Rough size of a token in characters, good enough for budgeting English text
+CHARS_PER_TOKEN = 4
+# Role markers and separators the chat format adds to every message
+MESSAGE_OVERHEAD = 4
+
+
+def estimate(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+
+def estimate_messages(messages):
+    """Estimated prompt tokens of a LangChain message list."""
+    return sum(estimate(message.text) + MESSAGE_OVERHEAD for message in messages)
+
+
+def reported(message):
+    """(input, output) tokens from a model message's usage_metadata, or None if it has none."""
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return None
+    return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+
+
+def add_usage(stats, prompt_tokens, completion_tokens, calls=1):
+    """Adds one or more model calls to the `calls`/`prompt_tokens`/`completion_tokens` totals in `stats`."""
+    if stats is None:
+        return
+    stats["calls"] = stats.get("calls", 0) + calls
+    stats["prompt_tokens"] = stats.get("prompt_tokens", 0) + prompt_tokens
+    stats["completion_tokens"] = stats.get("completion_tokens", 0) + completion_tokens
+
+
+def add_response_usage(stats, prompt, response):
+    """Adds one invoke() call: its reported usage, else estimates from `prompt` (messages) and the answer."""
+    usage = reported(response)
+    if usage is None:
+        usage = estimate_messages(prompt), estimate(response.text)
+    add_usage(stats, *usage)
@@ -0,0 +1,146 @@
+"""
+Lightweight per-stage timing.
+
+Each traced stage (transcript fetch, title lookup, database call, LLM call)
+produces one record with its wall time and, where known, bytes and tokens.
+Records go to three places:
+  - the current request's list, started with `begin()` and read with `finish()`
+    (app.py shows it in the sidebar);
+  - process-wide totals, exposed in Prometheus text format by `metrics_text()`
+    and, if METRICS_PORT is set, served over HTTP at /metrics;
+  - JSON lines on the "trace" logger, written to the file in TRACE_LOG if set.
+"""
+import contextvars
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger("trace")
+
+# A context variable rather than a thread-local, so work LangChain fans out
+# to its executor threads (which copy the context) lands in the same request.
+_records = contextvars.ContextVar("trace_records", default=None)
+_totals = {}
+_totals_lock = threading.Lock()
+_server = None
+_server_lock = threading.Lock()
+
+if os.environ.get("TRACE_LOG"):
+    _handler = logging.FileHandler(os.environ["TRACE_LOG"])
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+
+def begin():
+    """Starts collecting records for a new request in the current context."""
+    _records.set([])
+
+
+def finish():
+    """Stops collecting and returns this request's records."""
+    records = _records.get() or []
+    _records.set(None)
+    return records
+
+
+def record(stage, seconds, bytes=None, tokens=None):
+    entry = {"stage": stage, "ms": round(seconds * 1000, 3)}
+    if bytes is not None:
+        entry["bytes"] = bytes
+    if tokens is not None:
+        entry["tokens"] = tokens
+
+    records = _records.get()
+    if records is not None:
+        records.append(entry)
+    with _totals_lock:
+        totals = _totals.setdefault(stage, {"calls": 0, "seconds": 0.0, "bytes": 0, "tokens": 0})
+        totals["calls"] += 1
+        totals["seconds"] += seconds
+        totals["bytes"] += bytes or 0
+        totals["tokens"] += tokens or 0
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(json.dumps({"ts": time.time(), **entry}))
+
+
+@contextmanager
+def span(stage):
+    """
+    Times the enclosed block as `stage`. The yielded dict may be given
+    `bytes` and `tokens` entries, which are recorded with it.
+    """
+    info = {}
+    start = time.perf_counter()
+    try:
+        yield info
+    finally:
+        record(stage, time.perf_counter() - start, info.get("bytes"), info.get("tokens"))
+
+
+def traced(stage):
+    """Decorator form of `span` for functions whose only measure is wall time."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(stage, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def metrics_text():
+    """Process-wide totals per stage in Prometheus text exposition format."""
+    with _totals_lock:
+        totals = {stage: dict(values) for stage, values in _totals.items()}
+    lines = []
+    for name, key, kind, help_text in (
+        ("summarizer_stage_calls_total", "calls", "counter", "Calls per stage."),
+        ("summarizer_stage_seconds_total", "seconds", "counter", "Wall time spent per stage."),
+        ("summarizer_stage_bytes_total", "bytes", "counter", "Bytes transferred or stored per stage."),
+        ("summarizer_stage_tokens_total", "tokens", "counter", "LLM tokens per stage."),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for stage, values in sorted(totals.items()):
+            lines.append(f'{name}{{stage="{stage}"}} {values[key]}')
+    return "\n".join(lines) + "\n"
+
+
+def start_metrics_server():
+    """Serves /metrics on METRICS_PORT in a daemon thread, once per process. No-op if unset."""
+    global _server
+    port = os.environ.get("METRICS_PORT")
+    if not port:
+        return
+    # http.server pulls in the email package; only load it when metrics are on
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path != "/metrics":
+                self.send_error(404)
+                return
+            body = metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    with _server_lock:
+        if _server is not None:
+            return
+        _server = ThreadingHTTPServer(("127.0.0.1", int(port)), _MetricsHandler)
+    threading.Thread(target=_server.serve_forever, daemon=True).start()
@@ -0,0 +1,175 @@
+"""
+The one way to get a video's time-coded transcript, shared by the CLI, the
+web app, the job workers and the API.
+
+`get` reads the local library first and only goes to YouTube for videos that
+are not stored yet. `load` returns a stored video's transcript, fetching it
+again if maintenance.py evicted it. Fetches from YouTube:
+  - reuse one YouTubeTranscriptApi client, and so its pooled HTTP session;
+  - retry transient errors (network trouble, rate limiting, unparsable pages)
+    with jittered exponential backoff, up to ATTEMPTS tries;
+  - remember permanent failures (captions disabled, no transcript, private or
+    removed video) in the database for FAILURE_TTL seconds, so a bad URL fails
+    at once instead of going back to YouTube;
+  - are merged: concurrent calls for the same video wait for one fetch.
+"""
+import random
+import threading
+import time
+from concurrent.futures import Future
+
+import database
+import retrieval
+import segments
+import tracing
+from lazy import LazyObject
+
+ATTEMPTS = 3
+# Retry delay: BACKOFF_BASE * 2^(attempt - 1) seconds, capped, with +-50% jitter
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+# How long a permanent failure is remembered; captions may be added later
+FAILURE_TTL = 6 * 3600
+
+
+class TranscriptUnavailable(Exception):
+    """The video has no transcript that can be fetched (possibly remembered from an earlier try)."""
+
+
+def _make_api():
+    from youtube_transcript_api import YouTubeTranscriptApi
+    return YouTubeTranscriptApi()
+
+# One client for every fetch, keeping its connections to YouTube alive
+api = LazyObject(_make_api)
+
+_inflight = {}
+_lock = threading.Lock()
+_stats = {"store_hits": 0, "fetches": 0, "merged": 0, "retries": 0, "remembered_failures": 0, "failures": 0}
+
+
+def _count(name, amount=1):
+    with _lock:
+        _stats[name] += amount
+
+
+def stats():
+    """
+    Returns a copy of the counters: transcripts read from the library, fetched
+    from YouTube, served by another caller's fetch (merged), retried attempts,
+    failures answered from the database, and fetches that failed.
+    """
+    with _lock:
+        return dict(_stats)
+
+
+def backoff(attempt):
+    delay = min(BACKOFF_BASE * 2 ** (attempt - 1), BACKOFF_MAX)
+    return delay * random.uniform(0.5, 1.5)
+
+
+def _permanent(error):
+    """True for youtube_transcript_api errors that retrying cannot fix."""
+    import youtube_transcript_api as yta
+    return isinstance(error, (yta.AgeRestricted, yta.InvalidVideoId, yta.NoTranscriptFound, yta.NotTranslatable,
+                              yta.TranscriptsDisabled, yta.TranslationLanguageNotAvailable,
+                              yta.VideoUnavailable, yta.VideoUnplayable))
+
+
+def _describe(error):
+    # The library's messages run to a dozen lines of advice; its `cause` is the useful part
+    lines = str(getattr(error, "cause", None) or error).strip().splitlines()
+    return f"{type(error).__name__}: {lines[0]}" if lines else type(error).__name__
+
+
+def _from_store(video_id):
+    row = database.get_video(video_id)
+    if row is None:
+        return None
+    stored = segments.load(row[0])
+    if stored is None:
+        # Stored before segments were kept, or imported without them: the text alone
+        text = database.load_transcript(row[0])
+        stored = segments.Segments.from_text(text) if text is not None else None
+    return stored
+
+
+def _fetch(video_id):
+    """Fetches from YouTube. Raises TranscriptUnavailable, or the last error once retries run out."""
+    failure = database.get_transcript_failure(video_id)
+    if failure is not None and time.time() - failure[1] < FAILURE_TTL:
+        _count("remembered_failures")
+        raise TranscriptUnavailable(failure[0])
+
+    for attempt in range(1, ATTEMPTS + 1):
+        try:
+            with tracing.span("transcript") as info:
+                result = segments.Segments.from_snippets(api.fetch(video_id))
+                info["bytes"] = len(result.text.encode("utf-8"))
+        except Exception as e:
+            if _permanent(e):
+                _count("failures")
+                database.record_transcript_failure(video_id, _describe(e))
+                raise TranscriptUnavailable(_describe(e)) from e
+            if attempt == ATTEMPTS:
+                _count("failures")
+                raise
+            _count("retries")
+            time.sleep(backoff(attempt))
+        else:
+            _count("fetches")
+            if failure is not None:
+                database.clear_transcript_failure(video_id)
+            return result
+
+
+def get(video_id):
+    """
+    Returns a video's transcript as `segments.Segments`: from the library if it
+    is stored there (text only if its segments were never kept), else from YouTube. Raises
+    TranscriptUnavailable if the video has no transcript, or the last error if
+    YouTube could not be reached in ATTEMPTS tries.
+    """
+    stored = _from_store(video_id)
+    if stored is not None:
+        _count("store_hits")
+        return stored
+
+    with _lock:
+        future = _inflight.get(video_id)
+        leader = future is None
+        if leader:
+            future = _inflight[video_id] = Future()
+        else:
+            _stats["merged"] += 1
+    if leader:
+        try:
+            future.set_result(_fetch(video_id))
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with _lock:
+                del _inflight[video_id]
+    return future.result()
+
+
+def load(video_id):
+    """
+    Returns the transcript text of a stored video (by database id), or None if
+    there is no such video. A transcript evicted by maintenance.py is fetched
+    again and stored back with its chunk index and segments; this raises like
+    `get` if that fails.
+    """
+    text = database.load_transcript(video_id)
+    if text is not None:
+        return text
+    video = database.get_video_by_id(video_id)
+    if video is None:
+        return None
+    fetched = get(video[1])
+    index = retrieval.ChunkIndex.from_transcript(fetched.text)
+    with database.transaction():
+        database.save_transcript(video_id, fetched.text)
+        database.save_chunk_index(video_id, index.to_bytes())
+        segments.save(video_id, fetched)
+    return fetched.text
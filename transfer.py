@@ -0,0 +1,196 @@
+"""
+Moves the library between hosts, or merges one library into another.
+
+`export` streams every video (with its transcript, segments and chunk index)
+and its chat into a gzip'd JSON-lines file, one row per line. It reads one
+consistent snapshot, so the app can keep serving while it runs. `import`
+streams such a file back in, in transactions of --batch rows:
+  - videos are matched by YouTube ID. An existing video keeps its id, takes the
+    imported title (unless that is the unknown-title placeholder), and keeps
+    its own transcript if it has one;
+  - messages already in the chat (same role, content and timestamp) are skipped,
+    so importing the same file twice, or merging two copies of a library that
+    share history, adds nothing twice.
+Memory use does not grow with the library. Both commands report rows per second.
+
+    uv run transfer.py export library.jsonl.gz
+    uv run transfer.py import library.jsonl.gz --batch 20000
+    ssh old-host 'cat library.jsonl.gz' | uv run transfer.py import -
+"""
+import argparse
+import base64
+import gzip
+import itertools
+import json
+import os
+import sys
+import time
+
+import database
+from main import console, UNKNOWN_TITLE
+
+FORMAT = "youtube-video-summarizer-library"
+VERSION = 1
+# Rows per import transaction: large enough to amortize commits, small enough not to hold up the app
+BATCH = 20_000
+REPORT_EVERY = 10
+
+
+class Progress:
+    """Counts rows and prints the rate every REPORT_EVERY seconds."""
+
+    def __init__(self, verb):
+        self.verb = verb
+        self.rows = 0
+        self.start = self._last = time.perf_counter()
+
+    def add(self, rows=1):
+        self.rows += rows
+        now = time.perf_counter()
+        if now - self._last >= REPORT_EVERY:
+            self._last = now
+            console.print(f"{self.verb} {self.rows} rows  {self.rate():.0f} rows/s")
+
+    def elapsed(self):
+        return time.perf_counter() - self.start
+
+    def rate(self):
+        elapsed = self.elapsed()
+        return self.rows / elapsed if elapsed else 0.0
+
+
+def _b64(data):
+    return base64.b64encode(data).decode("ascii") if data is not None else None
+
+
+def _unb64(text):
+    return base64.b64decode(text) if text is not None else None
+
+
+def export(path):
+    """Writes the whole library to `path`. Returns {"videos", "messages", "rows_per_s", "bytes"}."""
+    progress = Progress("Exported")
+    counts = {"videos": 0, "messages": 0}
+    # Written under a temporary name, so an interrupted export never looks complete
+    partial = path + ".partial"
+    with gzip.open(partial, "wt", encoding="utf-8", compresslevel=6) as f, database.snapshot():
+        f.write(json.dumps({"format": FORMAT, "version": VERSION, "exported_at": time.time()}) + "\n")
+        for (video_id, youtube_id, title, created_at, last_opened_at,
+             transcript, segments, chunk_index) in database.iter_export_videos():
+            f.write(json.dumps({"type": "video", "youtube_id": youtube_id, "title": title,
+                                "created_at": created_at, "last_opened_at": last_opened_at,
+                                "transcript": transcript, "segments": _b64(segments),
+                                "chunk_index": _b64(chunk_index)}) + "\n")
+            counts["videos"] += 1
+            progress.add()
+            for role, content, timestamp in database.iter_export_messages(video_id):
+                f.write(json.dumps({"type": "message", "role": role, "content": content,
+                                    "timestamp": timestamp}) + "\n")
+                counts["messages"] += 1
+                progress.add()
+    os.replace(partial, path)
+    return {**counts, "rows_per_s": round(progress.rate(), 1), "seconds": round(progress.elapsed(), 2),
+            "bytes": os.path.getsize(path)}
+
+
+def read_records(path):
+    """Yields the rows of an export file after checking its header."""
+    stream = gzip.open(sys.stdin.buffer if path == "-" else path, "rt", encoding="utf-8")
+    with stream:
+        header = json.loads(next(stream, "{}"))
+        if header.get("format") != FORMAT:
+            raise ValueError(f"{path} is not a library export")
+        if header.get("version", 0) > VERSION:
+            raise ValueError(f"{path} is format version {header['version']}; this version reads up to {VERSION}")
+        for line in stream:
+            yield json.loads(line)
+
+
+def _import_video(record, counts):
+    """Upserts a video row and fills in its transcript if it has none. Returns (id, whether it is new)."""
+    video_id, inserted = database.upsert_video(
+        record["youtube_id"], record["title"], record["created_at"], record["last_opened_at"],
+        replace_title=record["title"] != UNKNOWN_TITLE)
+    counts["videos_added" if inserted else "videos_merged"] += 1
+    if record["transcript"] is not None and (inserted or not database.has_transcript(video_id)):
+        database.save_transcript(video_id, record["transcript"])
+        if record["segments"] is not None:
+            database.save_segments(video_id, _unb64(record["segments"]))
+        if record["chunk_index"] is not None:
+            database.save_chunk_index(video_id, _unb64(record["chunk_index"]))
+        counts["transcripts_added"] += 1
+    return video_id, inserted
+
+
+def import_(path, batch=BATCH):
+    """
+    Merges an export file into the library. Returns counts of videos added and
+    merged, transcripts and messages added, duplicate messages skipped, and rows per second.
+    """
+    progress = Progress("Imported")
+    counts = dict.fromkeys(("videos_added", "videos_merged", "transcripts_added",
+                            "messages_added", "messages_skipped"), 0)
+    records = read_records(path)
+    video_id, keys, pending = None, set(), []
+    while True:
+        with database.transaction():
+            rows = 0
+            for record in itertools.islice(records, batch):
+                rows += 1
+                if record["type"] == "video":
+                    if pending:
+                        database.insert_messages(video_id, pending)
+                        pending = []
+                    video_id, inserted = _import_video(record, counts)
+                    # A new video has no messages to collide with
+                    keys = set() if inserted else database.get_message_keys(video_id)
+                elif record["type"] == "message":
+                    key = database.message_key(record["role"], record["content"], record["timestamp"])
+                    if key in keys:
+                        counts["messages_skipped"] += 1
+                        continue
+                    keys.add(key)
+                    pending.append((record["role"], record["content"], record["timestamp"]))
+                    counts["messages_added"] += 1
+            if pending:
+                database.insert_messages(video_id, pending)
+                pending = []
+        progress.add(rows)
+        if rows < batch:
+            break
+    return {**counts, "rows": progress.rows, "rows_per_s": round(progress.rate(), 1),
+            "seconds": round(progress.elapsed(), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export", help="write the library to a file")
+    export_parser.add_argument("path", help="output file (gzip'd JSON lines)")
+    import_parser = commands.add_parser("import", help="merge an export file into the library")
+    import_parser.add_argument("path", help="export file, or - for stdin")
+    import_parser.add_argument("--batch", type=int, default=BATCH, help="rows per transaction")
+    args = parser.parse_args()
+
+    database.init_db()
+    if args.command == "export":
+        report = export(args.path)
+        console.print(f"[bold green]Exported[/bold green] {report['videos']} videos and {report['messages']} messages "
+                      f"in {report['seconds']:.1f}s ({report['rows_per_s']:.0f} rows/s, "
+                      f"{report['bytes'] / 1024 / 1024:.1f} MiB)")
+        return 0
+
+    try:
+        report = import_(args.path, args.batch)
+    except (ValueError, KeyError, OSError) as e:
+        console.print(f"[bold red]Error:[/bold red] {e}")
+        return 1
+    console.print(f"[bold green]Imported[/bold green] {report['rows']} rows in {report['seconds']:.1f}s "
+                  f"({report['rows_per_s']:.0f} rows/s): {report['videos_added']} videos added, "
+                  f"{report['videos_merged']} merged, {report['transcripts_added']} transcripts, "
+                  f"{report['messages_added']} messages added, {report['messages_skipped']} duplicates skipped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())